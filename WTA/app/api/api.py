@@ -1,13 +1,25 @@
+import hashlib
+import json
 import logging
 from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Literal
 
-from fastapi import FastAPI, Depends, Body as FastAPIBody
-from pydantic import BaseModel
+from fastapi import FastAPI, Depends, Body as FastAPIBody, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse, JSONResponse, Response
+from pydantic import BaseModel, Field
 from sqlmodel import Session
 
-from app.core.db import init_db, get_session
+from app.core.config import settings
+from app.core.db import (init_db, get_session, get_read_session, get_read_engine, check_db_health, pool_stats,
+                         dispose_engines)
+from app.core.profiling import Target, profiler, ProfilingMiddleware
+from app.service.batch_service import parse_symbols, get_latest_prices, get_moving_averages
 from app.service.get_service import store_raw_response_and_return_price_point
 from app.service.post_service import creating_polling_job
+from app.service.write_behind import write_behind_buffer
+from scripts.kafkaProducer import init_producer, flush_producer
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
@@ -15,11 +27,21 @@ logging.basicConfig(level=logging.INFO)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # Engines and the Kafka producer are created lazily; warm them up here so the first
+    # request does not pay for it, and release them on shutdown.
+    logger.info(f"Starting API (event bus: {settings.EVENT_BUS}, Kafka: {settings.KAFKA_BOOTSTRAP_SERVERS})")
     init_db()
+    init_producer()
+    if settings.WRITE_BEHIND_ENABLED:
+        write_behind_buffer.start()
     yield
+    write_behind_buffer.stop()
+    flush_producer()
+    dispose_engines()
 
 
 app = FastAPI(lifespan=lifespan)
+app.add_middleware(ProfilingMiddleware)
 
 
 class Body(BaseModel):
@@ -28,14 +50,97 @@ class Body(BaseModel):
     provider: str
 
 
+class ProfilingBody(BaseModel):
+    target: Target = "request"
+    count: int = Field(10, gt=0)
+    enabled: bool = True
+
+
+@app.get("/health")
+def health():
+    database = check_db_health()
+    status_code = 200 if database["primary"] == "ok" else 503
+    status = "ok" if all(state == "ok" for state in database.values()) else "degraded"
+    return JSONResponse(status_code=status_code,
+                        content={"status": status, "database": database, "pools": pool_stats()})
+
+
+def etag_response(request: Request, payload) -> Response:
+    """JSON response with an ETag; answers 304 when the client's If-None-Match already matches."""
+    content = jsonable_encoder(payload)
+    body = json.dumps(content, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    etag = f'"{hashlib.sha1(body).hexdigest()}"'
+    if_none_match = request.headers.get("if-none-match", "")
+    client_tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    if etag in client_tags or "*" in client_tags:
+        return Response(status_code=304, headers={"ETag": etag})
+    return JSONResponse(content=content, headers={"ETag": etag})
+
+
+def require_profiling_admin():
+    if not settings.PROFILING_ADMIN_ENABLED:
+        raise HTTPException(status_code=403, detail="Profiling admin endpoints are disabled")
+
+
+@app.get("/admin/profiling", dependencies=[Depends(require_profiling_admin)])
+def get_profiling_status():
+    return profiler.status()
+
+
+@app.post("/admin/profiling", dependencies=[Depends(require_profiling_admin)])
+def set_profiling(body: ProfilingBody = FastAPIBody(...)):
+    if body.enabled:
+        profiler.arm(body.target, body.count)
+    else:
+        profiler.disarm(body.target)
+    return profiler.status()
+
+
 @app.get("/prices/latest")
-def get_Price_Data(symbol: str, provider: str = "yfinance", session: Session = Depends(get_session)):
+def get_Price_Data(request: Request, symbol: str | None = None, symbols: str | None = None,
+                   provider: str = "yfinance", session: Session = Depends(get_session),
+                   read_session: Session = Depends(get_read_session)):
+    if symbols is not None:
+        symbol_list = parse_symbols(symbols)
+        logger.info(f"Fetching latest prices for {len(symbol_list)} symbols from provider: {provider}")
+        return etag_response(request, get_latest_prices(symbol_list, provider, read_session, session))
+    if symbol is None:
+        raise HTTPException(status_code=422, detail="Either symbol or symbols is required")
     logger.info(f"Fetching latest price data for symbol: {symbol} from provider: {provider}")
     return store_raw_response_and_return_price_point(symbol, session, provider)
 
 
+@app.get("/averages")
+def get_averages(request: Request, symbols: str, read_session: Session = Depends(get_read_session)):
+    symbol_list = parse_symbols(symbols)
+    logger.info(f"Fetching moving averages for {len(symbol_list)} symbols")
+    return etag_response(request, get_moving_averages(symbol_list, read_session))
+
+
 @app.post("/prices/poll")
 def create_polling_job(body: Body = FastAPIBody(...), session: Session = Depends(get_session)):
     logger.info(
         f"Creating polling job for symbols: {body.symbols} with interval: {body.interval} seconds from provider: {body.provider}")
     return creating_polling_job(body.symbols, body.interval, body.provider, session)
+
+
+@app.get("/prices/export")
+def export_prices(dataset: Literal["prices", "ohlc"] = "prices", since: datetime | None = None,
+                  symbols: str | None = None):
+    symbol_list = [s.strip() for s in symbols.split(",") if s.strip()] if symbols else None
+    logger.info(f"Exporting {dataset} as an Arrow stream for symbols: {symbol_list} since: {since}")
+
+    # pyarrow is only imported once an export is requested.
+    from app.service.export_service import (OHLC_SCHEMA, PRICE_SCHEMA, iter_arrow_ipc_stream, iter_ohlc_tables,
+                                            iter_price_batches)
+
+    def stream():
+        # The session has to outlive the request handler, so it is owned by the generator.
+        with Session(get_read_engine()) as session:
+            batches = iter_price_batches(session, since=since, symbols=symbol_list)
+            if dataset == "ohlc":
+                yield from iter_arrow_ipc_stream(iter_ohlc_tables(batches), OHLC_SCHEMA)
+            else:
+                yield from iter_arrow_ipc_stream(batches, PRICE_SCHEMA)
+
+    return StreamingResponse(stream(), media_type="application/vnd.apache.arrow.stream")
@@ -0,0 +1,37 @@
+import logging
+import queue
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class InMemoryBus:
+    """Bounded in-process replacement for the Kafka price topic, used when EVENT_BUS=memory.
+
+    Producers block for at most ``publish_timeout`` seconds when the queue is full and the event is
+    dropped afterwards, mirroring how a full local Kafka producer queue is handled."""
+
+    def __init__(self, max_size: int, publish_timeout: float = 1.0):
+        self._queue = queue.Queue(maxsize=max_size)
+        self.publish_timeout = publish_timeout
+
+    def publish(self, event: dict) -> bool:
+        try:
+            self._queue.put(event, timeout=self.publish_timeout)
+            return True
+        except queue.Full:
+            logger.error(f"In-memory event bus is full ({self._queue.maxsize} events awaiting consumption).")
+            return False
+
+    def consume(self, timeout: float = 1.0):
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def __len__(self):
+        return self._queue.qsize()
+
+
+memory_bus = InMemoryBus(settings.EVENT_BUS_QUEUE_SIZE)
@@ -1,3 +1,5 @@
+from typing import Optional, Literal
+
 from pydantic_settings import BaseSettings;
 
 
@@ -11,9 +13,67 @@ class Settings(BaseSettings):
     POSTGRES_PASSWORD: str
     POSTGRES_DB: str
 
+    MOVING_AVERAGE_WINDOW: int = 5
+    # Batch /prices/latest serves stored prices fetched less than this many seconds ago.
+    LATEST_PRICE_MAX_AGE: int = 60
+    # Stale symbols of a batch request are fetched upstream on this many shared threads. After
+    # LATEST_PRICE_REFRESH_TIMEOUT seconds the request serves the stored value (or reports the
+    # symbol missing) for whatever has not been refreshed yet.
+    LATEST_PRICE_REFRESH_WORKERS: int = 8
+    LATEST_PRICE_REFRESH_TIMEOUT: float = 10.0
+    # Exports only include price points created at least this many seconds ago. created_at is
+    # set before the row is committed (the poller commits once per job, write-behind once per
+    # batch), and exports read from the replica when one is configured, so younger rows may
+    # still become visible with an older created_at.
+    EXPORT_WATERMARK_LAG: int = 300
+
+    # "kafka" publishes price events to KAFKA_PRICE_TOPIC. "memory" passes them to the
+    # MA consumer through a bounded in-process queue; it only works when the publisher and
+    # the consumer share a process (scripts/EmbeddedPipeline.py).
+    EVENT_BUS: Literal["kafka", "memory"] = "kafka"
+    EVENT_BUS_QUEUE_SIZE: int = 10000
+
+    # MAConsumer keeps each symbol's rolling window in memory and snapshots it, together with
+    # the matching topic offsets, every MA_CHECKPOINT_INTERVAL seconds so restarts and
+    # rebalances restore state in bulk instead of querying PricePoint per symbol.
+    MA_CHECKPOINT_ENABLED: bool = True
+    MA_CHECKPOINT_INTERVAL: float = 30.0
+
+    # Connection pooling. Each service (api, poller, consumer) reads these from its own
+    # environment, so they can be tuned per container in docker-compose.yml.
+    # Read-only queries go to DATABASE_REPLICA_URL when it is set, to the primary otherwise.
+    DATABASE_REPLICA_URL: Optional[str] = None
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_STATEMENT_TIMEOUT_MS: int = 0
+    DB_ECHO: bool = False
+    # How often (seconds) the poller and the consumer log pool gauges.
+    DB_POOL_STATS_INTERVAL: int = 60
+
+    # Write-behind ingestion for GET /prices/latest. When enabled the endpoint
+    # returns as soon as the price is parsed and storage/publishing happen in
+    # batches on a background thread. FLUSH_INTERVAL bounds how long (seconds)
+    # a queued item may wait, i.e. the window of data lost on a hard crash.
+    WRITE_BEHIND_ENABLED: bool = False
+    WRITE_BEHIND_QUEUE_SIZE: int = 10000
+    WRITE_BEHIND_BATCH_SIZE: int = 500
+    WRITE_BEHIND_FLUSH_INTERVAL: float = 1.0
+    WRITE_BEHIND_ENQUEUE_TIMEOUT: float = 0.05
+
+    # Opt-in sampling profiler. PROFILE_TARGETS arms sections at startup, e.g.
+    # "request:20,poll_cycle:3,consumer_batch:500". At runtime, targets can be armed through
+    # POST /admin/profiling (when PROFILING_ADMIN_ENABLED) or, for the workers, with SIGUSR2.
+    # Entries with an unknown target or a non-positive count are logged and ignored.
+    PROFILE_TARGETS: str = ""
+    PROFILE_DIR: str = "profiles"
+    PROFILE_INTERVAL_MS: float = 5.0
+    PROFILE_SIGNAL_COUNT: int = 10
+    PROFILING_ADMIN_ENABLED: bool = False
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
 
 settings = Settings()
-print(f"Configured Kafka bootstrap servers: {settings.KAFKA_BOOTSTRAP_SERVERS}")
@@ -1,15 +1,148 @@
+import logging
+import threading
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session as OrmSession
 from sqlmodel import create_engine, SQLModel, Session
 
 from app.core.config import settings
 
+logger = logging.getLogger(__name__)
+
 DATABASE_URL = settings.DATABASE_URL
-engine = create_engine(DATABASE_URL, echo=True)
+
+# Rows per multi-row INSERT ... ON CONFLICT statement.
+UPSERT_BATCH_SIZE = 1000
+
+
+def build_engine(url: str):
+    """Create an engine with the pool settings of the current service."""
+    if url.startswith("sqlite"):
+        # Embedded mode: the API, poller and consumer threads share one SQLite file.
+        return create_engine(url, echo=settings.DB_ECHO, connect_args={"check_same_thread": False})
+    connect_args = {}
+    if url.startswith("postgresql"):
+        options = "-c timezone=utc"
+        if settings.DB_STATEMENT_TIMEOUT_MS > 0:
+            options += f" -c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"
+        connect_args["options"] = options
+    return create_engine(url,
+                         echo=settings.DB_ECHO,
+                         pool_size=settings.DB_POOL_SIZE,
+                         max_overflow=settings.DB_MAX_OVERFLOW,
+                         pool_timeout=settings.DB_POOL_TIMEOUT,
+                         pool_recycle=settings.DB_POOL_RECYCLE,
+                         pool_pre_ping=True,
+                         connect_args=connect_args)
+
+
+# Engines are created on first use so that importing this module (tests, CLIs, workers)
+# does not pay for database setup. Writes always go to the primary. Reads that can tolerate
+# replication lag use the read engine, which is the primary itself when no replica is configured.
+_engine = None
+_read_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = build_engine(DATABASE_URL)
+    return _engine
+
+
+def get_read_engine():
+    global _read_engine
+    if _read_engine is None:
+        if not settings.DATABASE_REPLICA_URL:
+            return get_engine()
+        with _engine_lock:
+            if _read_engine is None:
+                _read_engine = build_engine(settings.DATABASE_REPLICA_URL)
+    return _read_engine
+
+
+def dispose_engines():
+    global _engine, _read_engine
+    with _engine_lock:
+        for db_engine in (_engine, _read_engine):
+            if db_engine is not None:
+                db_engine.dispose()
+        _engine, _read_engine = None, None
+
+
+def sessionLocal():
+    return OrmSession(bind=get_engine(), autoflush=False)
+
+
+def readSessionLocal():
+    return OrmSession(bind=get_read_engine(), autoflush=False)
+
+
+def dialect_insert(bind):
+    """INSERT construct with on_conflict_do_update support for the bound database."""
+    return sqlite.insert if bind.dialect.name == "sqlite" else postgresql.insert
+
+
+def as_utc(timestamp: datetime) -> datetime:
+    """Timestamps are stored in UTC; SQLite hands them back without a timezone."""
+    return timestamp.replace(tzinfo=timezone.utc) if timestamp.tzinfo is None else timestamp
 
 
 def init_db():
-    SQLModel.metadata.create_all(engine)
+    SQLModel.metadata.create_all(get_engine())
 
 
 def get_session():
-    with Session(engine) as session:
+    with Session(get_engine()) as session:
+        yield session
+
+
+def get_read_session():
+    with Session(get_read_engine()) as session:
         yield session
+
+
+def _engines():
+    engines = {"primary": get_engine()}
+    if get_read_engine() is not engines["primary"]:
+        engines["replica"] = get_read_engine()
+    return engines
+
+
+def check_db_health():
+    health = {}
+    for name, db_engine in _engines().items():
+        try:
+            with db_engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+            health[name] = "ok"
+        except Exception as e:
+            logger.error(f"Database health check failed for {name}: {e}")
+            health[name] = "unavailable"
+    return health
+
+
+def pool_stats():
+    stats = {}
+    for name, db_engine in _engines().items():
+        pool = db_engine.pool
+        if not hasattr(pool, "checkedout"):
+            continue
+        stats[name] = {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow(),
+        }
+    return stats
+
+
+def log_pool_stats():
+    for name, stats in pool_stats().items():
+        logger.info(f"DB pool [{name}] size={stats['size']} checked_out={stats['checked_out']} "
+                    f"checked_in={stats['checked_in']} overflow={stats['overflow']}")
@@ -0,0 +1,211 @@
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import nullcontext
+from typing import Literal, get_args
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_NOOP = nullcontext()
+
+Target = Literal["request", "poll_cycle", "consumer_batch"]
+TARGETS = get_args(Target)
+
+
+def _collapse(frame, prefix: str) -> str:
+    """Render a frame's stack root-first in the collapsed format used by flamegraph.pl/speedscope."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    names.append(prefix)
+    return ";".join(reversed(names))
+
+
+class _Capture:
+    """Stacks sampled over ``count`` sections of one target, written to a single .folded file."""
+
+    def __init__(self, target: str, count: int):
+        self.target = target
+        self.to_start = count
+        self.active = 0
+        self.samples = Counter()
+        self.started_at = time.strftime("%Y%m%d-%H%M%S")
+
+
+class _Section:
+    def __init__(self, profiler, capture: _Capture, all_threads: bool):
+        self.profiler = profiler
+        self.capture = capture
+        self.all_threads = all_threads
+        self._stop = threading.Event()
+        self._sampler = None
+
+    def __enter__(self):
+        target_ident = None if self.all_threads else threading.get_ident()
+        self._sampler = threading.Thread(target=self._sample, args=(target_ident,), name="profiler", daemon=True)
+        self._sampler.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._sampler.join()
+        self.profiler._finish(self.capture)
+        return False
+
+    def _sample(self, target_ident):
+        own_ident = threading.get_ident()
+        interval = self.profiler.interval
+        names = {}
+        while not self._stop.wait(interval):
+            frames = sys._current_frames()
+            if target_ident is not None:
+                frames = {target_ident: frames[target_ident]} if target_ident in frames else {}
+            for ident, frame in frames.items():
+                if ident == own_ident:
+                    continue
+                if ident not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                self.capture.samples[_collapse(frame, names.get(ident, str(ident)))] += 1
+
+
+class Profiler:
+    """Opt-in sampling profiler for requests, poll cycles and consumer batches.
+
+    ``arm(target, count)`` profiles the next ``count`` sections of ``target``; sections are wrapped with
+    ``section(target)``, which returns a shared no-op context manager while the target is not armed, so
+    the cost when profiling is off is a dict lookup. Stacks are sampled every ``interval`` seconds from
+    a helper thread and written as collapsed stacks (``<dir>/<target>-<time>-<pid>.folded``) once all
+    ``count`` sections have finished."""
+
+    def __init__(self, output_dir: str, interval: float):
+        self.output_dir = output_dir
+        self.interval = interval
+        self._captures = {}
+        self._lock = threading.Lock()
+        # Arm requests from signal handlers, applied by the next section() outside the handler.
+        self._pending = deque()
+        self.written = []
+
+    @classmethod
+    def from_settings(cls):
+        profiler = cls(settings.PROFILE_DIR, settings.PROFILE_INTERVAL_MS / 1000)
+        for entry in filter(None, (e.strip() for e in settings.PROFILE_TARGETS.split(","))):
+            target, _, count = entry.partition(":")
+            try:
+                profiler.arm(target.strip(), int(count or 1))
+            except ValueError as e:
+                logger.error(f"Ignoring PROFILE_TARGETS entry '{entry}': {e}")
+        return profiler
+
+    def arm(self, target: str, count: int):
+        if target not in TARGETS:
+            raise ValueError(f"unknown profiling target '{target}', expected one of {', '.join(TARGETS)}")
+        if count < 1:
+            raise ValueError(f"profiling count must be positive, got {count}")
+        with self._lock:
+            capture = self._captures.get(target)
+            if capture is None:
+                self._captures[target] = _Capture(target, count)
+            else:
+                capture.to_start += count
+        logger.info(f"Profiling armed for the next {count} '{target}' sections.")
+
+    def request_arm(self, target: str, count: int):
+        """Signal-safe variant of ``arm``: it takes no lock, the request is applied by the next
+        ``section`` or ``is_armed`` call."""
+        self._pending.append((target, count))
+
+    def _apply_pending(self):
+        while self._pending:
+            target, count = self._pending.popleft()
+            try:
+                self.arm(target, count)
+            except ValueError as e:
+                logger.error(f"Ignoring profiling request: {e}")
+
+    def disarm(self, target: str):
+        with self._lock:
+            capture = self._captures.get(target)
+            if capture is not None:
+                capture.to_start = 0
+                if capture.active == 0:
+                    self._write(self._captures.pop(target))
+
+    def status(self):
+        with self._lock:
+            armed = {t: {"remaining": c.to_start, "active": c.active} for t, c in self._captures.items()}
+        return {"armed": armed, "written": list(self.written)}
+
+    def is_armed(self, target: str) -> bool:
+        if self._pending:
+            self._apply_pending()
+        return target in self._captures
+
+    def section(self, target: str, all_threads: bool = False):
+        if self._pending:
+            self._apply_pending()
+        if target not in self._captures:
+            return _NOOP
+        with self._lock:
+            capture = self._captures.get(target)
+            # Sections that sample every thread would double count each other, so they run one at a time.
+            if capture is None or capture.to_start <= 0 or (all_threads and capture.active):
+                return _NOOP
+            capture.to_start -= 1
+            capture.active += 1
+        return _Section(self, capture, all_threads)
+
+    def _finish(self, capture: _Capture):
+        with self._lock:
+            capture.active -= 1
+            if capture.to_start > 0 or capture.active > 0:
+                return
+            if self._captures.get(capture.target) is capture:
+                del self._captures[capture.target]
+            self._write(capture)
+
+    def _write(self, capture: _Capture):
+        if not capture.samples:
+            logger.info(f"Profiling of '{capture.target}' finished without samples.")
+            return
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, f"{capture.target}-{capture.started_at}-{os.getpid()}.folded")
+        with open(path, "w") as f:
+            for stack, count in capture.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        self.written.append(path)
+        logger.info(f"Wrote {sum(capture.samples.values())} samples of '{capture.target}' to {path}")
+
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling whole requests while the "request" target is armed.
+    Request handlers run on the threadpool, so every thread is sampled."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not profiler.is_armed("request"):
+            return await self.app(scope, receive, send)
+        with profiler.section("request", all_threads=True):
+            return await self.app(scope, receive, send)
+
+
+def install_signal_toggle(target: str):
+    """Arm ``target`` for PROFILE_SIGNAL_COUNT sections whenever the process receives SIGUSR2.
+    The handler interrupts the main thread, which may hold the profiler lock inside a section,
+    so it only queues the request."""
+    if not hasattr(signal, "SIGUSR2"):
+        return
+    signal.signal(signal.SIGUSR2, lambda signum, frame: profiler.request_arm(target, settings.PROFILE_SIGNAL_COUNT))
+
+
+profiler = Profiler.from_settings()
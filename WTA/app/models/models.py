@@ -2,20 +2,27 @@ from datetime import datetime, timezone
 from typing import Optional, List
 from uuid import UUID, uuid4
 
-from sqlalchemy import Column, String, Integer
+from sqlalchemy import Column, String, Integer, JSON, Index
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlmodel import SQLModel, Field, ARRAY
 
+# Postgres keeps its native types; other databases (SQLite in embedded mode) fall back to JSON.
+JSONType = JSON().with_variant(JSONB(), "postgresql")
+StringArrayType = JSON().with_variant(ARRAY(String), "postgresql")
+
 
 class RawResponse(SQLModel, table=True):
     id: UUID = Field(default_factory=uuid4, primary_key=True)
     provider: str = Field(max_length=50)
     symbol: str = Field(max_length=20)
-    response_data: dict = Field(sa_column=Column(JSONB))
+    response_data: dict = Field(sa_column=Column(JSONType))
     received_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 
 class PricePoint(SQLModel, table=True):
+    # Serves latest-per-symbol lookups and the consumer's window query.
+    __table_args__ = (Index("ix_pricepoint_symbol_timestamp", "symbol", "timestamp"),)
+
     id: UUID = Field(default_factory=UUID, primary_key=True)
     symbol: str = Field(max_length=20)
     price: float
@@ -33,9 +40,26 @@ class SymbolAverage(SQLModel, table=True):
 
 class PollingJob(SQLModel, table=True):
     job_id: UUID = Field(default_factory=UUID, primary_key=True, index=True)
-    symbols: List[str] = Field(sa_column=Column(ARRAY(String)))
+    symbols: List[str] = Field(sa_column=Column(StringArrayType))
     provider: str = Field(max_length=50)
     interval: int = Field(sa_column=Column("interval", Integer, nullable=False))
     is_active: bool = Field(default=True)
     last_run_at: Optional[datetime] = None
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+class WindowCheckpoint(SQLModel, table=True):
+    """Snapshot of MAConsumer's rolling window for one symbol: [[iso timestamp, point id, price], ...]."""
+    symbol: str = Field(primary_key=True, max_length=20)
+    kafka_partition: Optional[int] = Field(default=None, index=True)
+    window_size: int
+    window: list = Field(sa_column=Column(JSONType))
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+class OffsetCheckpoint(SQLModel, table=True):
+    """Last price-topic offset reflected in the WindowCheckpoint rows of a partition."""
+    topic: str = Field(primary_key=True, max_length=255)
+    kafka_partition: int = Field(primary_key=True)
+    kafka_offset: int
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
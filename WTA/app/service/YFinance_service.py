@@ -3,8 +3,6 @@
 import logging
 from datetime import datetime, timezone
 
-import yfinance as yf
-
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
@@ -22,6 +20,9 @@ class YFinanceProvider:
     def fetch_price_data(self, symbol: str):
 
         try:
+            # Imported on first use: yfinance pulls in pandas, which dominates import time.
+            import yfinance as yf
+
             ticker = yf.Ticker(symbol)
             info = ticker.info
 
@@ -0,0 +1,136 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
+
+from fastapi import HTTPException
+from sqlalchemy import String, column, func, select, true, values
+from sqlalchemy.orm import aliased
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.core.db import as_utc
+from app.models.models import PricePoint, SymbolAverage
+from app.service.get_service import store_raw_response_and_return_price_point
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+MAX_BATCH_SYMBOLS = 200
+
+# Shared by all requests so concurrent cold dashboards do not multiply upstream calls; threads
+# are only started once a refresh is submitted.
+_refresh_pool = ThreadPoolExecutor(max_workers=settings.LATEST_PRICE_REFRESH_WORKERS,
+                                   thread_name_prefix="price-refresh")
+
+
+def parse_symbols(symbols: str) -> list[str]:
+    parsed = list(dict.fromkeys(s.strip() for s in symbols.split(",") if s.strip()))
+    if not parsed:
+        raise HTTPException(status_code=422, detail="At least one symbol is required")
+    if len(parsed) > MAX_BATCH_SYMBOLS:
+        raise HTTPException(status_code=422, detail=f"At most {MAX_BATCH_SYMBOLS} symbols are allowed per request")
+    return parsed
+
+
+def _stored_price(row) -> dict:
+    # Same shape as the single-symbol response, where "timestamp" is when the price was fetched.
+    return {"symbol": row.symbol, "price": row.price, "timestamp": as_utc(row.created_at), "provider": row.provider}
+
+
+def get_latest_stored_prices(symbols: list[str], read_session: Session) -> dict:
+    """Latest PricePoint of each symbol, found with one probe of the (symbol, timestamp) index per
+    symbol instead of ranking the whole history of every requested symbol."""
+    columns = (PricePoint.symbol, PricePoint.price, PricePoint.provider, PricePoint.created_at)
+    if read_session.get_bind().dialect.name == "postgresql":
+        requested = values(column("symbol", String), name="requested").data([(symbol,) for symbol in symbols])
+        latest = (select(*columns)
+                  .where(PricePoint.symbol == requested.c.symbol)
+                  .order_by(PricePoint.timestamp.desc(), PricePoint.created_at.desc())
+                  .limit(1)
+                  .lateral("latest"))
+        rows = read_session.execute(select(latest).select_from(requested).join(latest, true())).all()
+        return {row.symbol: row for row in rows}
+
+    # Databases without LATERAL (SQLite in embedded mode) match each symbol's max(timestamp) and
+    # break timestamp ties on created_at in Python.
+    newer = aliased(PricePoint)
+    latest_timestamp = select(func.max(newer.timestamp)).where(newer.symbol == PricePoint.symbol).scalar_subquery()
+    rows = read_session.execute(select(*columns).where(PricePoint.symbol.in_(symbols),
+                                                       PricePoint.timestamp == latest_timestamp)).all()
+    latest = {}
+    for row in rows:
+        if row.symbol not in latest or as_utc(row.created_at) > as_utc(latest[row.symbol].created_at):
+            latest[row.symbol] = row
+    return latest
+
+
+def _refresh_price(symbol: str, provider: str, bind):
+    with Session(bind) as session:
+        return store_raw_response_and_return_price_point(symbol, session, provider)
+
+
+def refresh_prices(symbols: list[str], provider: str, bind) -> dict:
+    """Fetch ``symbols`` upstream concurrently, each with its own session on ``bind``, and return
+    {symbol: stored price} for those refreshed within LATEST_PRICE_REFRESH_TIMEOUT seconds.
+    Fetches that have not started by then are cancelled."""
+    futures = {_refresh_pool.submit(_refresh_price, symbol, provider, bind): symbol for symbol in symbols}
+    done, not_done = wait(futures, timeout=settings.LATEST_PRICE_REFRESH_TIMEOUT)
+    for future in not_done:
+        future.cancel()
+    if not_done:
+        logger.warning(f"{len(not_done)} symbols were not refreshed within {settings.LATEST_PRICE_REFRESH_TIMEOUT}s: "
+                       f"{sorted(futures[future] for future in not_done)}")
+
+    refreshed = {}
+    for future in done:
+        symbol = futures[future]
+        try:
+            refreshed[symbol] = future.result()
+        except HTTPException as e:
+            logger.warning(f"Could not refresh {symbol}: {e.detail}")
+    return refreshed
+
+
+def get_latest_prices(symbols: list[str], provider: str, read_session: Session, write_session: Session):
+    stored = get_latest_stored_prices(symbols, read_session)
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.LATEST_PRICE_MAX_AGE)
+
+    prices, missing, stale = [], [], []
+    for symbol in symbols:
+        row = stored.get(symbol)
+        if row is None or as_utc(row.created_at) < cutoff:
+            stale.append(symbol)
+            continue
+        prices.append(_stored_price(row))
+
+    refreshed = {}
+    if stale:
+        logger.info(f"Fetching {len(stale)} stale symbols upstream: {stale}")
+        refreshed = refresh_prices(stale, provider, write_session.get_bind())
+    for symbol in stale:
+        fresh = refreshed.get(symbol)
+        if fresh is None:
+            row = stored.get(symbol)
+            if row is None:
+                missing.append(symbol)
+            else:
+                # Serve the stale value rather than nothing when the provider is slow or unavailable.
+                prices.append(_stored_price(row))
+            continue
+        prices.append({"symbol": symbol, "price": fresh["price"], "timestamp": fresh["timestamp"],
+                       "provider": fresh["provider"]})
+
+    order = {symbol: i for i, symbol in enumerate(symbols)}
+    prices.sort(key=lambda price: order[price["symbol"]])
+    return {"prices": prices, "missing": missing}
+
+
+def get_moving_averages(symbols: list[str], read_session: Session):
+    rows = read_session.execute(select(SymbolAverage).where(SymbolAverage.symbol.in_(symbols))).scalars().all()
+    found = {row.symbol: row for row in rows}
+    return {
+        "averages": [{"symbol": symbol, "moving_average": found[symbol].moving_average,
+                      "last_updated_at": as_utc(found[symbol].last_updated_at)}
+                     for symbol in symbols if symbol in found],
+        "missing": [symbol for symbol in symbols if symbol not in found],
+    }
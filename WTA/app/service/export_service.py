@@ -0,0 +1,284 @@
+import json
+import logging
+import os
+import shutil
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.models.models import PricePoint
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+DEFAULT_CHUNK_SIZE = 50000
+WATERMARK_FILE = "_watermark.json"
+
+PRICE_SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("symbol", pa.string()),
+    ("price", pa.float64()),
+    ("provider", pa.string()),
+    ("timestamp", pa.timestamp("us", tz="UTC")),
+    ("raw_response_id", pa.string()),
+    ("created_at", pa.timestamp("us", tz="UTC")),
+])
+
+OHLC_SCHEMA = pa.schema([
+    ("symbol", pa.string()),
+    ("date", pa.date32()),
+    ("open", pa.float64()),
+    ("high", pa.float64()),
+    ("low", pa.float64()),
+    ("close", pa.float64()),
+    ("count", pa.int64()),
+])
+
+PARTITIONING = ds.partitioning(pa.schema([("date", pa.date32()), ("symbol", pa.string())]), flavor="hive")
+
+
+def iter_price_batches(session, chunk_size: int = DEFAULT_CHUNK_SIZE, since: datetime | None = None,
+                       symbols: list[str] | None = None, until: datetime | None = None):
+    """Stream PricePoint rows as Arrow record batches of at most ``chunk_size`` rows, ordered by
+    (symbol, timestamp) and read through a server-side cursor. ``since`` (exclusive) and ``until``
+    (inclusive) filter on created_at."""
+    stmt = select(PricePoint.id, PricePoint.symbol, PricePoint.price, PricePoint.provider, PricePoint.timestamp,
+                  PricePoint.raw_response_id, PricePoint.created_at).order_by(PricePoint.symbol,
+                                                                              PricePoint.timestamp)
+    if since is not None:
+        stmt = stmt.where(PricePoint.created_at > since)
+    if until is not None:
+        stmt = stmt.where(PricePoint.created_at <= until)
+    if symbols:
+        stmt = stmt.where(PricePoint.symbol.in_(symbols))
+    result = session.execute(stmt.execution_options(stream_results=True, yield_per=chunk_size))
+
+    for partition in result.partitions():
+        ids, syms, prices, providers, timestamps, raw_ids, created = zip(*partition)
+        yield pa.record_batch([
+            pa.array([str(i) for i in ids], pa.string()),
+            pa.array(syms, pa.string()),
+            pa.array(prices, pa.float64()),
+            pa.array(providers, pa.string()),
+            pa.array(timestamps, PRICE_SCHEMA.field("timestamp").type),
+            pa.array([str(i) if i is not None else None for i in raw_ids], pa.string()),
+            pa.array(created, PRICE_SCHEMA.field("created_at").type),
+        ], schema=PRICE_SCHEMA)
+
+
+class OhlcAggregator:
+    """Turns (symbol, timestamp)-ordered price batches into daily OHLC bars.
+
+    The last (symbol, date) group of each batch may continue in the next batch, so its rows are
+    held back until the group is known to be complete or ``finish`` is called."""
+
+    def __init__(self):
+        self._pending = None
+
+    def add(self, batch: pa.RecordBatch) -> pa.Table | None:
+        table = self._with_date(pa.Table.from_batches([batch]))
+        if self._pending is not None:
+            table = pa.concat_tables([self._pending, table])
+        if table.num_rows == 0:
+            return None
+
+        last_symbol, last_date = table["symbol"][-1], table["date"][-1]
+        is_last_group = pc.and_(pc.equal(table["symbol"], last_symbol), pc.equal(table["date"], last_date))
+        self._pending = table.filter(is_last_group)
+        complete = table.filter(pc.invert(is_last_group))
+        return self._aggregate(complete) if complete.num_rows else None
+
+    def finish(self) -> pa.Table | None:
+        pending, self._pending = self._pending, None
+        return self._aggregate(pending) if pending is not None and pending.num_rows else None
+
+    @staticmethod
+    def _with_date(table: pa.Table) -> pa.Table:
+        return table.select(["symbol", "timestamp", "price"]).append_column(
+            "date", pc.cast(table["timestamp"], pa.date32()))
+
+    @staticmethod
+    def _aggregate(table: pa.Table) -> pa.Table:
+        bars = table.group_by(["symbol", "date"], use_threads=False).aggregate([
+            ("price", "first"), ("price", "max"), ("price", "min"), ("price", "last"), ("price", "count")])
+        return pa.table({
+            "symbol": bars["symbol"],
+            "date": bars["date"],
+            "open": bars["price_first"],
+            "high": bars["price_max"],
+            "low": bars["price_min"],
+            "close": bars["price_last"],
+            "count": bars["price_count"],
+        }, schema=OHLC_SCHEMA).sort_by([("symbol", "ascending"), ("date", "ascending")])
+
+
+def iter_ohlc_tables(batches):
+    aggregator = OhlcAggregator()
+    for batch in batches:
+        bars = aggregator.add(batch)
+        if bars is not None:
+            yield bars
+    bars = aggregator.finish()
+    if bars is not None:
+        yield bars
+
+
+def read_watermark(root_path: str) -> datetime | None:
+    path = os.path.join(root_path, WATERMARK_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return datetime.fromisoformat(json.load(f)["created_at"])
+
+
+def write_watermark(root_path: str, watermark: datetime):
+    path = os.path.join(root_path, WATERMARK_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"created_at": watermark.isoformat()}, f)
+    os.replace(tmp_path, path)
+
+
+def remove_watermark(root_path: str):
+    path = os.path.join(root_path, WATERMARK_FILE)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def _max_created_at(batch: pa.RecordBatch, current: datetime | None) -> datetime | None:
+    batch_max = pc.max(batch["created_at"]).as_py()
+    if batch_max is None:
+        return current
+    return batch_max if current is None or batch_max > current else current
+
+
+def rebuild_ohlc(root_path: str, touched: set, basename_template: str) -> int:
+    """Recompute the daily bars of the ``touched`` (symbol, date) pairs from every exported price
+    of that day and replace their ``ohlc`` partitions."""
+    prices = ds.dataset(os.path.join(root_path, "prices"), format="parquet", partitioning=PARTITIONING)
+    bars = []
+    for symbol, day in sorted(touched):
+        table = prices.to_table(columns=["symbol", "timestamp", "price"],
+                                filter=(pc.field("symbol") == symbol) & (pc.field("date") == day))
+        if table.num_rows:
+            bars.append(OhlcAggregator._aggregate(OhlcAggregator._with_date(table.sort_by("timestamp"))))
+    if bars:
+        pq.write_to_dataset(pa.concat_tables(bars), os.path.join(root_path, "ohlc"), partition_cols=["date", "symbol"],
+                            basename_template=basename_template, existing_data_behavior="delete_matching")
+    return len(bars)
+
+
+def _swap_in(staging_path: str, root_path: str):
+    """Replace ``prices/`` and ``ohlc/`` of ``root_path`` with those written to ``staging_path``."""
+    for name in ("prices", "ohlc"):
+        shutil.rmtree(os.path.join(root_path, name), ignore_errors=True)
+        if os.path.exists(os.path.join(staging_path, name)):
+            os.replace(os.path.join(staging_path, name), os.path.join(root_path, name))
+
+
+def export_parquet(session, root_path: str, incremental: bool = False, include_ohlc: bool = True,
+                   chunk_size: int = DEFAULT_CHUNK_SIZE, symbols: list[str] | None = None,
+                   lag: float | None = None):
+    """Write price points to ``<root>/prices/date=.../symbol=.../*.parquet`` and daily bars to
+    ``<root>/ohlc/...``. Only rows created at least ``lag`` seconds ago (EXPORT_WATERMARK_LAG by
+    default) are exported, so rows still being committed are left for the next run.
+
+    A full export (or an incremental one without a stored watermark) is written to a staging
+    directory and replaces both datasets when it completes. With ``incremental`` only rows
+    created after the stored watermark are appended, and the bars of every (symbol, date) they
+    touch are rebuilt from all exported prices of that day. The watermark covers every symbol,
+    so ``symbols`` cannot be combined with ``incremental``, and a full export restricted to
+    ``symbols`` removes the watermark instead of writing one."""
+    if incremental and symbols:
+        raise ValueError("symbols cannot be combined with an incremental export; the watermark covers every symbol")
+    os.makedirs(root_path, exist_ok=True)
+    since = read_watermark(root_path) if incremental else None
+    until = datetime.now(timezone.utc) - timedelta(seconds=settings.EXPORT_WATERMARK_LAG if lag is None else lag)
+    run_id = uuid.uuid4().hex
+    full = since is None
+    target_path = os.path.join(root_path, f".staging-{run_id}") if full else root_path
+    watermark = since
+    exported = 0
+    aggregator = OhlcAggregator()
+    touched = set()
+
+    def write_dataset(table, name, part):
+        pq.write_to_dataset(table, os.path.join(target_path, name), partition_cols=["date", "symbol"],
+                            basename_template=f"part-{run_id}-{part}-{{i}}.parquet")
+
+    try:
+        part = 0
+        for part, batch in enumerate(iter_price_batches(session, chunk_size, since, symbols, until)):
+            table = pa.Table.from_batches([batch])
+            table = table.append_column("date", pc.cast(table["timestamp"], pa.date32()))
+            write_dataset(table, "prices", part)
+            exported += batch.num_rows
+            watermark = _max_created_at(batch, watermark)
+            if include_ohlc and not full:
+                touched.update(zip(table["symbol"].to_pylist(), table["date"].to_pylist()))
+            elif include_ohlc:
+                bars = aggregator.add(batch)
+                if bars is not None:
+                    write_dataset(bars, "ohlc", part)
+        if include_ohlc and not full:
+            rebuilt = rebuild_ohlc(root_path, touched, f"part-{run_id}-{{i}}.parquet")
+            logger.info(f"Rebuilt {rebuilt} daily bars touched by this export.")
+        elif include_ohlc:
+            bars = aggregator.finish()
+            if bars is not None:
+                write_dataset(bars, "ohlc", part + 1)
+        if full:
+            _swap_in(target_path, root_path)
+    finally:
+        if full:
+            shutil.rmtree(target_path, ignore_errors=True)
+
+    if full and symbols:
+        # A partial snapshot; the next incremental run starts over with a full export.
+        remove_watermark(root_path)
+        watermark = None
+    elif watermark is not None and watermark != since:
+        write_watermark(root_path, watermark)
+    logger.info(f"Exported {exported} price points to {root_path} (watermark: {watermark})")
+    return exported, watermark
+
+
+class _ChunkSink:
+    """Minimal writable file object that hands written bytes back to a generator."""
+
+    def __init__(self):
+        self.chunks = []
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data, self.chunks = b"".join(self.chunks), []
+        return data
+
+
+def iter_arrow_ipc_stream(batches, schema: pa.Schema):
+    """Encode tables/record batches as an Arrow IPC stream, yielding bytes as each one is written."""
+    sink = _ChunkSink()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for batch in batches:
+            if isinstance(batch, pa.Table):
+                writer.write_table(batch)
+            else:
+                writer.write_batch(batch)
+            yield sink.drain()
+    yield sink.drain()
@@ -6,7 +6,9 @@ from sqlmodel import Session
 
 from app.models.models import RawResponse, PricePoint
 from app.service.YFinance_service import YFinanceProvider
-from scripts.kafkaProducer import publish_price_event
+from app.core.config import settings
+from app.service.write_behind import write_behind_buffer
+from scripts.kafkaProducer import publish_price_event, build_price_event
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
@@ -35,6 +37,11 @@ def store_raw_response_and_return_price_point(symbol: str, session: Session, pro
         symbol=symbol
     )
 
+    if settings.WRITE_BEHIND_ENABLED and write_behind_buffer.submit(new_entry, new_pricePoint):
+        session.close()
+        return {"message": "Raw response queued for storage", "price": current_price, "symbol": symbol,
+                "timestamp": new_entry.received_at, "provider": provider}
+
     try:
         session.add(new_entry)
         session.flush()
@@ -50,15 +57,7 @@ def store_raw_response_and_return_price_point(symbol: str, session: Session, pro
         raise HTTPException(status_code=500, detail=f"Error storing raw response: {str(e)}")
     finally:
         try:
-            processed_pricePoint = {
-                "id": str(new_pricePoint.id),
-                "price": new_pricePoint.price,
-                "symbol": new_pricePoint.symbol,
-                "provider": new_pricePoint.provider,
-                "timestamp": new_pricePoint.timestamp.isoformat(),
-                "raw_response_id": str(new_pricePoint.raw_response_id)
-            }
-            publish_price_event(processed_pricePoint)
+            publish_price_event(build_price_event(new_pricePoint))
         except Exception as e:
             logger.error(f"Failed to publish price event for {symbol}: {e}")
 
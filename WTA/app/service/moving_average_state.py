@@ -0,0 +1,151 @@
+import bisect
+import logging
+from datetime import datetime, timezone
+
+from sqlalchemy import select
+
+from app.core.db import UPSERT_BATCH_SIZE, as_utc, dialect_insert
+from app.models.models import WindowCheckpoint, OffsetCheckpoint
+
+logger = logging.getLogger(__name__)
+
+class RollingWindow:
+    """The latest ``size`` price points of a symbol as (timestamp, point id, price), ordered by timestamp.
+
+    Points are identified by their PricePoint id so replayed events are not counted twice, while
+    distinct points sharing a timestamp (e.g. repeated polls outside market hours) still are."""
+
+    def __init__(self, size: int, points=None):
+        self.size = size
+        self.points = []
+        for timestamp, point_id, price in points or []:
+            self.add(timestamp, point_id, price)
+
+    def add(self, timestamp: datetime, point_id, price: float) -> bool:
+        """Add a point; returns False if it is already in the window or older than a full window."""
+        point = (as_utc(timestamp), str(point_id), float(price))
+        if any(existing[1] == point[1] for existing in self.points):
+            return False
+        index = bisect.bisect_left(self.points, point)
+        if len(self.points) >= self.size and index == 0:
+            return False
+        self.points.insert(index, point)
+        del self.points[:-self.size]
+        return True
+
+    @property
+    def full(self) -> bool:
+        return len(self.points) >= self.size
+
+    def moving_average(self):
+        if not self.full:
+            return None
+        return sum(price for _, _, price in self.points) / self.size, self.points[-1][0]
+
+    def to_json(self):
+        return [[timestamp.isoformat(), point_id, price] for timestamp, point_id, price in self.points]
+
+    @classmethod
+    def from_json(cls, size: int, data):
+        return cls(size, [(datetime.fromisoformat(timestamp), point_id, price) for timestamp, point_id, price in data])
+
+
+class WindowState:
+    """Per-symbol rolling windows of MAConsumer plus the topic offsets they reflect.
+
+    Windows of symbols that changed since the last checkpoint are tracked so a checkpoint only
+    writes those rows; the offsets of every partition touched are written in the same transaction."""
+
+    def __init__(self, window_size: int, topic: str):
+        self.window_size = window_size
+        self.topic = topic
+        self.windows = {}
+        self.partitions = {}
+        self.offsets = {}
+        self._dirty = set()
+        self._dirty_offsets = set()
+
+    def __contains__(self, symbol: str):
+        return symbol in self.windows
+
+    def seed(self, symbol: str, points):
+        self.windows[symbol] = RollingWindow(self.window_size, points)
+        self._dirty.add(symbol)
+
+    def apply(self, symbol: str, timestamp: datetime, point_id, price: float, partition: int | None = None,
+              offset: int | None = None):
+        """Add a price to the symbol's window and return (moving_average, latest_timestamp), or None
+        while the window is not full."""
+        window = self.windows.setdefault(symbol, RollingWindow(self.window_size))
+        if window.add(timestamp, point_id, price):
+            self._dirty.add(symbol)
+        if partition is not None:
+            self.partitions[symbol] = partition
+            if offset is not None:
+                self.offsets[partition] = offset
+                self._dirty_offsets.add(partition)
+        return window.moving_average()
+
+    def restore(self, session, partitions: list[int]) -> dict:
+        """Bulk-load the checkpoints of ``partitions`` and return {partition: next offset to read}."""
+        if not partitions:
+            return {}
+        rows = session.execute(select(WindowCheckpoint).where(WindowCheckpoint.kafka_partition.in_(partitions))).scalars()
+        restored = 0
+        for row in rows:
+            if row.window_size != self.window_size:
+                continue
+            self.windows[row.symbol] = RollingWindow.from_json(self.window_size, row.window)
+            self.partitions[row.symbol] = row.kafka_partition
+            restored += 1
+
+        offsets = session.execute(select(OffsetCheckpoint).where(OffsetCheckpoint.topic == self.topic,
+                                                                 OffsetCheckpoint.kafka_partition.in_(partitions))).scalars()
+        next_offsets = {}
+        for row in offsets:
+            self.offsets[row.kafka_partition] = row.kafka_offset
+            next_offsets[row.kafka_partition] = row.kafka_offset + 1
+        logger.info(f"Restored {restored} symbol windows and {len(next_offsets)} offsets for partitions {partitions}")
+        return next_offsets
+
+    def checkpoint(self, session, partitions: list[int] | None = None):
+        """Write changed windows and offsets (optionally only those of ``partitions``) in one transaction."""
+        symbols = [s for s in self._dirty if partitions is None or self.partitions.get(s) in partitions]
+        offset_partitions = [p for p in self._dirty_offsets if partitions is None or p in partitions]
+        if not symbols and not offset_partitions:
+            return 0
+
+        now = datetime.now(timezone.utc)
+        insert = dialect_insert(session.get_bind())
+        window_rows = [{"symbol": symbol, "kafka_partition": self.partitions.get(symbol),
+                        "window_size": self.window_size, "window": self.windows[symbol].to_json(),
+                        "updated_at": now} for symbol in symbols]
+        for start in range(0, len(window_rows), UPSERT_BATCH_SIZE):
+            stmt = insert(WindowCheckpoint).values(window_rows[start:start + UPSERT_BATCH_SIZE])
+            session.execute(stmt.on_conflict_do_update(
+                index_elements=["symbol"],
+                set_=dict(kafka_partition=stmt.excluded.kafka_partition, window_size=stmt.excluded.window_size,
+                          window=stmt.excluded.window, updated_at=stmt.excluded.updated_at)))
+        if offset_partitions:
+            stmt = insert(OffsetCheckpoint).values([{"topic": self.topic, "kafka_partition": p,
+                                                     "kafka_offset": self.offsets[p], "updated_at": now}
+                                                    for p in offset_partitions])
+            session.execute(stmt.on_conflict_do_update(
+                index_elements=["topic", "kafka_partition"],
+                set_=dict(kafka_offset=stmt.excluded.kafka_offset, updated_at=stmt.excluded.updated_at)))
+        session.commit()
+
+        self._dirty.difference_update(symbols)
+        self._dirty_offsets.difference_update(offset_partitions)
+        logger.info(f"Checkpointed {len(symbols)} symbol windows and {len(offset_partitions)} partition offsets.")
+        return len(symbols)
+
+    def drop_partitions(self, partitions: list[int]):
+        """Forget the state of partitions this consumer no longer owns."""
+        for symbol in [s for s, p in self.partitions.items() if p in partitions]:
+            self.windows.pop(symbol, None)
+            self.partitions.pop(symbol, None)
+            self._dirty.discard(symbol)
+        for partition in partitions:
+            self.offsets.pop(partition, None)
+            self._dirty_offsets.discard(partition)
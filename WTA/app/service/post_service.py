@@ -17,7 +17,7 @@ def creating_polling_job(symbols: list[str], interval: int, provider: str, sessi
             raise HTTPException(status_code=404, detail=f"Symbol {symbol} not found in provider {provider}")
 
 
-    new_job = PollingJob(job_id=job_id, symbols=symbols, interval=interval, provider=providerInstance, is_active=True)
+    new_job = PollingJob(job_id=job_id, symbols=symbols, interval=interval, provider=provider, is_active=True)
     return_config = {
         "symbols": symbols,
         "interval": interval,
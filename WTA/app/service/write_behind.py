@@ -0,0 +1,162 @@
+import logging
+import queue
+import threading
+import time
+
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.core.db import get_engine
+from app.models.models import RawResponse, PricePoint
+from scripts.kafkaProducer import publish_price_event, build_price_event, flush_producer
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+
+class WriteBehindBuffer:
+    """Bounded in-process queue of (RawResponse, PricePoint) pairs.
+
+    A single background thread drains the queue, bulk-inserts each batch in one
+    transaction and publishes the price events once the batch is committed.
+    A batch is written when it reaches ``batch_size`` items or when its oldest
+    item has waited ``flush_interval`` seconds, whichever comes first.
+    A batch whose commit fails is retried once after ``retry_backoff`` seconds and
+    then written one pair per transaction, so a bad row only loses itself.
+    """
+
+    def __init__(self, max_size: int, batch_size: int, flush_interval: float, enqueue_timeout: float,
+                 session_factory=None, retry_backoff: float = 0.5):
+        self._queue = queue.Queue(maxsize=max_size)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.retry_backoff = retry_backoff
+        self._session_factory = session_factory or (lambda: Session(get_engine()))
+        self._stopping = threading.Event()
+        # Held while enqueuing and while setting _stopping, so nothing is queued after the
+        # writer thread may have seen the queue empty for the last time.
+        self._submit_lock = threading.Lock()
+        self._thread = None
+
+    @classmethod
+    def from_settings(cls):
+        return cls(max_size=settings.WRITE_BEHIND_QUEUE_SIZE,
+                   batch_size=settings.WRITE_BEHIND_BATCH_SIZE,
+                   flush_interval=settings.WRITE_BEHIND_FLUSH_INTERVAL,
+                   enqueue_timeout=settings.WRITE_BEHIND_ENQUEUE_TIMEOUT)
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+        logger.info(f"Write-behind buffer started (batch_size={self.batch_size}, "
+                    f"flush_interval={self.flush_interval}s, max_size={self._queue.maxsize})")
+
+    def submit(self, raw_response: RawResponse, price_point: PricePoint) -> bool:
+        """Queue a pair for storage. Returns False if the buffer is full or not running,
+        in which case the caller is expected to store the pair itself."""
+        with self._submit_lock:
+            if not self.running or self._stopping.is_set():
+                return False
+            try:
+                self._queue.put((raw_response, price_point), timeout=self.enqueue_timeout)
+                return True
+            except queue.Full:
+                logger.warning("Write-behind buffer is full, falling back to a synchronous write.")
+                return False
+
+    def stop(self, timeout: float = 30.0):
+        """Stop accepting work and flush everything that is still queued."""
+        if self._thread is None:
+            return
+        with self._submit_lock:
+            self._stopping.set()
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.error(f"Write-behind buffer did not finish flushing within {timeout}s "
+                         f"({self._queue.qsize()} items left).")
+        self._thread = None
+        flush_producer()
+
+    def _run(self):
+        while not (self._stopping.is_set() and self._queue.empty()):
+            batch = self._next_batch()
+            if batch:
+                self._write_batch(batch)
+
+    def _next_batch(self):
+        try:
+            batch = [self._queue.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._stopping.is_set():
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        # On shutdown take whatever is already queued without waiting.
+        while self._stopping.is_set() and len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write_batch(self, batch):
+        # Build the events before committing; committed objects are expired once their session closes.
+        events = {id(point): build_price_event(point) for _, point in batch}
+        stored = self._store_batch(batch)
+        for event in [events[id(point)] for _, point in stored]:
+            try:
+                publish_price_event(event)
+            except Exception as e:
+                logger.error(f"Failed to publish price event for {event['symbol']}: {e}")
+        logger.info(f"Stored and published write-behind batch of {len(stored)} price points.")
+
+    def _store_batch(self, batch):
+        """Store the batch and return the pairs that were committed."""
+        for attempt in range(2):
+            try:
+                self._commit(batch)
+                return batch
+            except Exception as e:
+                logger.warning(f"Failed to store write-behind batch of {len(batch)} price points "
+                               f"(attempt {attempt + 1}): {e}")
+                if attempt == 0:
+                    time.sleep(self.retry_backoff)
+
+        logger.warning(f"Storing write-behind batch of {len(batch)} price points one row at a time.")
+        stored = []
+        for raw_response, price_point in batch:
+            try:
+                self._commit([(raw_response, price_point)])
+                stored.append((raw_response, price_point))
+            except Exception as e:
+                logger.error(f"Dropping price point for {price_point.symbol} at {price_point.timestamp}: {e}")
+        return stored
+
+    def _commit(self, pairs):
+        with self._session_factory() as session:
+            try:
+                session.add_all([raw for raw, _ in pairs])
+                session.flush()
+                session.add_all([point for _, point in pairs])
+                session.commit()
+            except Exception:
+                session.rollback()
+                raise
+
+
+write_behind_buffer = WriteBehindBuffer.from_settings()
@@ -0,0 +1,74 @@
+import argparse
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Embedded mode always uses the in-process bus; set before settings are loaded.
+os.environ.setdefault("EVENT_BUS", "memory")
+
+import uvicorn
+
+from app.core.bus import memory_bus
+from app.core.config import settings
+from app.core.db import init_db, dispose_engines
+
+import scripts.MAConsumer as ma_consumer
+import scripts.Poller as poller
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CONSUMER_DRAIN_TIMEOUT = 60
+
+
+# Consumer shutdown is left to main(): it has to drain what the API and the poller published.
+def stop_poller(signum=None, frame=None):
+    poller.graceful_shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the API, poller and MA consumer in a single process.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args()
+
+    if settings.EVENT_BUS != "memory":
+        logger.warning("Embedded mode is running with EVENT_BUS=kafka; events will go through the broker.")
+
+    started = time.perf_counter()
+    init_db()
+    consume = ma_consumer.consume_memory_events if settings.EVENT_BUS == "memory" else ma_consumer.consumer_price_event
+    poller_thread = threading.Thread(target=poller.poll_for_jobs, name="poller", daemon=True)
+    consumer_thread = threading.Thread(target=consume, name="ma-consumer", daemon=True)
+    poller_thread.start()
+    consumer_thread.start()
+    logger.info(f"Embedded pipeline workers started in {time.perf_counter() - started:.2f}s "
+                f"(database: {settings.DATABASE_URL.split('://')[0]}, event bus: {settings.EVENT_BUS})")
+
+    # uvicorn installs its own SIGINT/SIGTERM handlers while serving and re-raises the signal to
+    # these ones once the API has shut down.
+    signal.signal(signal.SIGINT, stop_poller)
+    signal.signal(signal.SIGTERM, stop_poller)
+    try:
+        uvicorn.run("app.api.api:app", host=args.host, port=args.port)
+    finally:
+        # The API's shutdown has flushed the write-behind buffer into the bus. Stop the poller
+        # next, then let the consumer drain the bus before it stops.
+        stop_poller()
+        poller_thread.join(timeout=settings.POLLING_INTERVAL + 5)
+        ma_consumer.graceful_shutdown()
+        consumer_thread.join(timeout=CONSUMER_DRAIN_TIMEOUT)
+        if consumer_thread.is_alive():
+            logger.error(f"MA consumer did not drain the event bus within {CONSUMER_DRAIN_TIMEOUT}s "
+                         f"({len(memory_bus)} events left).")
+        dispose_engines()
+        logger.info("Embedded pipeline stopped.")
+
+
+if __name__ == "__main__":
+    main()
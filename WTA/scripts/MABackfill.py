@@ -0,0 +1,172 @@
+import argparse
+import csv
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+from sqlalchemy import select, delete, exists
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.core.config import settings
+from app.core.db import sessionLocal, readSessionLocal, dialect_insert, UPSERT_BATCH_SIZE
+from app.models.models import PricePoint, SymbolAverage
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def rolling_mean(prices: np.ndarray, window: int) -> np.ndarray:
+    """Mean of every full ``window`` of ``prices``; element i covers prices[i:i + window]."""
+    if len(prices) < window:
+        return np.empty(0, dtype=np.float64)
+    cumulative = np.cumsum(np.insert(prices, 0, 0.0))
+    return (cumulative[window:] - cumulative[:-window]) / window
+
+
+def compute_segment(symbol: str, timestamps: list, prices: np.ndarray, window: int, with_history: bool):
+    """Runs in a worker process. ``timestamps``/``prices`` are ordered by timestamp and may start
+    with ``window - 1`` rows carried over from the previous segment of the same symbol."""
+    means = rolling_mean(prices, window)
+    if len(means) == 0:
+        return symbol, None, None, None
+    history = None
+    if with_history:
+        history = list(zip(timestamps[window - 1:], means.tolist()))
+    return symbol, float(means[-1]), timestamps[-1], history
+
+
+def iter_segments(db_session, window: int, chunk_size: int, symbols: list[str] | None = None):
+    """Stream (symbol, timestamps, prices) segments from a server-side cursor ordered by
+    (symbol, timestamp). A symbol with more than ``chunk_size`` rows is split into several
+    segments that overlap by ``window - 1`` rows so no window is lost at the boundary."""
+    stmt = select(PricePoint.symbol, PricePoint.timestamp, PricePoint.price).order_by(PricePoint.symbol,
+                                                                                     PricePoint.timestamp)
+    if symbols:
+        stmt = stmt.where(PricePoint.symbol.in_(symbols))
+    result = db_session.execute(stmt.execution_options(stream_results=True, yield_per=chunk_size))
+
+    current_symbol, timestamps, prices, carried = None, [], [], 0
+    for partition in result.partitions():
+        for symbol, timestamp, price in partition:
+            if symbol != current_symbol:
+                if len(timestamps) > carried:
+                    yield current_symbol, timestamps, np.asarray(prices, dtype=np.float64)
+                current_symbol, timestamps, prices, carried = symbol, [], [], 0
+            timestamps.append(timestamp)
+            prices.append(price)
+            if len(timestamps) >= chunk_size:
+                yield current_symbol, timestamps, np.asarray(prices, dtype=np.float64)
+                carried = window - 1
+                timestamps, prices = timestamps[len(timestamps) - carried:], prices[len(prices) - carried:]
+    if len(timestamps) > carried:
+        yield current_symbol, timestamps, np.asarray(prices, dtype=np.float64)
+
+
+def store_averages(db_session, latest: dict, window: int, symbols: list[str] | None = None):
+    """Upsert ``latest`` and, in the same transaction, delete the averages of symbols in scope
+    (``symbols``, or every symbol) that no longer have a full window, e.g. after the window grew.
+
+    ``latest`` may come from a replica snapshot while the consumer keeps writing to the primary,
+    so an average is only replaced by one at least as recent, and a symbol is only deleted if the
+    primary confirms it has fewer than ``window`` price points."""
+    rows = [{"symbol": symbol, "moving_average": ma_value, "last_updated_at": timestamp}
+            for symbol, (ma_value, timestamp) in latest.items()]
+    insert = dialect_insert(db_session.get_bind())
+    for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+        stmt = insert(SymbolAverage).values(rows[start:start + UPSERT_BATCH_SIZE])
+        db_session.execute(stmt.on_conflict_do_update(
+            index_elements=['symbol'],
+            set_=dict(moving_average=stmt.excluded.moving_average, last_updated_at=stmt.excluded.last_updated_at),
+            where=SymbolAverage.last_updated_at <= stmt.excluded.last_updated_at
+        ))
+
+    # A symbol has a full window if its window-th price point exists.
+    has_full_window = exists(select(PricePoint.id).where(PricePoint.symbol == SymbolAverage.symbol)
+                             .offset(window - 1))
+    existing = select(SymbolAverage.symbol)
+    if symbols:
+        existing = existing.where(SymbolAverage.symbol.in_(symbols))
+    candidates = [symbol for symbol in db_session.execute(existing).scalars() if symbol not in latest]
+    removed = 0
+    for start in range(0, len(candidates), UPSERT_BATCH_SIZE):
+        batch = candidates[start:start + UPSERT_BATCH_SIZE]
+        result = db_session.execute(delete(SymbolAverage).where(SymbolAverage.symbol.in_(batch), ~has_full_window))
+        removed += result.rowcount
+    db_session.commit()
+    logger.info(f"Stored moving averages for {len(rows)} symbols.")
+    if removed:
+        logger.info(f"Removed moving averages of {removed} symbols without a full window.")
+    return removed
+
+
+def run_backfill(window: int, chunk_size: int, workers: int, symbols: list[str] | None = None,
+                 history_out: str | None = None):
+    latest = {}
+    rows_seen = 0
+    started = time.perf_counter()
+    history_file = open(history_out, "w", newline="") if history_out else None
+    history_writer = csv.writer(history_file) if history_file else None
+    if history_writer:
+        history_writer.writerow(["symbol", "timestamp", "moving_average"])
+
+    def collect(future):
+        symbol, ma_value, timestamp, history = future.result()
+        if ma_value is None:
+            return
+        if symbol not in latest or latest[symbol][1] < timestamp:
+            latest[symbol] = (ma_value, timestamp)
+        if history_writer and history:
+            history_writer.writerows((symbol, ts.isoformat(), value) for ts, value in history)
+
+    try:
+        with readSessionLocal() as read_session, ProcessPoolExecutor(max_workers=workers) as pool:
+            in_flight = set()
+            for symbol, timestamps, prices in iter_segments(read_session, window, chunk_size, symbols):
+                rows_seen += len(timestamps)
+                in_flight.add(pool.submit(compute_segment, symbol, timestamps, prices, window,
+                                          history_writer is not None))
+                # Bound the number of segments held in memory at once.
+                if len(in_flight) >= workers * 2:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        collect(future)
+                    elapsed = time.perf_counter() - started
+                    logger.info(f"Processed {rows_seen} rows ({rows_seen / elapsed:.0f} rows/sec)")
+            for future in wait(in_flight).done:
+                collect(future)
+
+        with sessionLocal() as db_session:
+            store_averages(db_session, latest, window, symbols)
+    finally:
+        if history_file:
+            history_file.close()
+
+    elapsed = time.perf_counter() - started
+    logger.info(f"Backfill complete: {rows_seen} rows, {len(latest)} symbols in {elapsed:.2f}s "
+                f"({rows_seen / elapsed if elapsed else 0:.0f} rows/sec)")
+    return rows_seen, len(latest)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute SymbolAverage from stored PricePoint history.")
+    parser.add_argument("--symbols", nargs="*", help="Only rebuild these symbols (default: all).")
+    parser.add_argument("--window", type=int, default=settings.MOVING_AVERAGE_WINDOW,
+                        help="Moving average window size.")
+    parser.add_argument("--chunk-size", type=int, default=50000,
+                        help="Rows fetched per cursor round trip and maximum rows per segment.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes.")
+    parser.add_argument("--history-out", help="Also write the full moving-average series to this CSV file.")
+    args = parser.parse_args()
+
+    if args.window < 1 or args.chunk_size < args.window:
+        parser.error("--window must be >= 1 and --chunk-size must be >= --window")
+
+    run_backfill(args.window, args.chunk_size, args.workers, args.symbols, args.history_out)
+
+
+if __name__ == "__main__":
+    main()
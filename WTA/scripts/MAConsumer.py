@@ -3,30 +3,24 @@ import logging
 import signal
 import os
 import sys
+import time
 
 from confluent_kafka import Consumer, KafkaError, KafkaException
-from sqlalchemy import create_engine
-from sqlalchemy.dialects.postgresql import insert
-from sqlalchemy.orm import sessionmaker
 
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 
+from app.core.bus import memory_bus
 from app.core.config import settings
+from app.core.db import sessionLocal, log_pool_stats, dialect_insert, get_engine, dispose_engines
+from app.core.profiling import profiler, install_signal_toggle
 from app.models.models import PricePoint, SymbolAverage
+from app.service.moving_average_state import WindowState
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-try:
-    engine = create_engine(settings.DATABASE_URL)
-    sessionLocal = sessionmaker(autoflush=False, autocommit=False, bind=engine)
-    logger.info("Database engine created successfully.")
-except Exception as e:
-    logger.error(f"Failed to create database engine: {e}")
-    exit(1)
-
 consumer_config = {
     'bootstrap.servers': settings.KAFKA_BOOTSTRAP_SERVERS,
     'group.id': 'MAConsumerGroup',
@@ -35,23 +29,16 @@ consumer_config = {
 
 running = True
 
-def graceful_shutdown():
+window_state = WindowState(settings.MOVING_AVERAGE_WINDOW, settings.KAFKA_PRICE_TOPIC)
+
+def graceful_shutdown(signum=None, frame=None):
     global running
     logger.info("Shutting down gracefully...")
     running = False
 
-signal.signal(signal.SIGINT, graceful_shutdown)
-signal.signal(signal.SIGTERM, graceful_shutdown)
-
-def calculate_and_store_moving_average(symbol: str, db_session):
-
+def store_moving_average(symbol: str, ma_value: float, latest_timestamp, db_session):
     try:
-        results =  get_ma_and_timestamp(symbol, db_session)
-
-        if results is None:
-            logger.error(f"Failed to calculate moving average for {symbol}.")
-            return
-        ma_value, latest_timestamp = results
+        insert = dialect_insert(db_session.get_bind())
         stmt = insert(SymbolAverage).values(symbol= symbol, moving_average=ma_value, last_updated_at=latest_timestamp)
         upsert_stmt = stmt.on_conflict_do_update(
             index_elements=['symbol'],
@@ -67,37 +54,93 @@ def calculate_and_store_moving_average(symbol: str, db_session):
         return
 
 
+def get_recent_price_points(symbol: str, db_session):
+    results = (db_session.query(PricePoint.timestamp, PricePoint.id, PricePoint.price).filter(PricePoint.symbol == symbol).order_by(PricePoint.timestamp.desc()).limit(settings.MOVING_AVERAGE_WINDOW).all())
+    return [(timestamp, point_id, price) for timestamp, point_id, price in results]
 
 
+def process_price_event(price_data: dict, partition: int | None = None, offset: int | None = None):
+    price_event = PricePoint.model_validate(price_data)
+    symbol = price_event.symbol
 
-def get_ma_and_timestamp(symbol: str, db_session):
-    try:
-        results = (db_session.query(PricePoint.price, PricePoint.timestamp).filter(PricePoint.symbol == symbol).order_by(PricePoint.timestamp.desc()).limit(5).all())
+    logger.info(f"Received message for symbol: {symbol}, price: {price_event.price}, timestamp: {price_event.timestamp}")
 
-        if not results:
-            logger.warning(f"No price points found for symbol: {symbol}")
-            return
-        if len(results) < 5:
-            logger.info(f"Not enough data points for {symbol} calculate moving average (found {len(results)})")
+    with sessionLocal() as db_session:
+        # Symbols without restored state are seeded from PricePoint once; after that the
+        # window is maintained from the events alone. The event's own row was just written,
+        # so this read goes to the primary rather than a possibly lagging replica.
+        if symbol not in window_state:
+            window_state.seed(symbol, get_recent_price_points(symbol, db_session))
+        results = window_state.apply(symbol, price_event.timestamp, price_event.id, price_event.price, partition, offset)
+        if results is None:
+            logger.info(f"Not enough data points for {symbol} to calculate moving average")
             return
+        ma_value, latest_timestamp = results
+        store_moving_average(symbol, ma_value, latest_timestamp, db_session)
 
-        price_values = [r[0] for r in results]
-        ma_value = sum(price_values) / len(price_values)
-        latest_timestamp = results[0][1]
-        logger.info(f"Calculated moving average for {symbol}: {ma_value:.2f} ")
-    except Exception as e:
-        logger.error(f"Error calculating moving average for {symbol}: {e}")
+
+def checkpoint_state(partitions: list[int] | None = None):
+    if not settings.MA_CHECKPOINT_ENABLED:
         return
-    return ma_value, latest_timestamp
+    try:
+        with sessionLocal() as db_session:
+            window_state.checkpoint(db_session, partitions)
+    except Exception as e:
+        logger.error(f"Failed to checkpoint consumer state: {e}")
+
+
+def on_assign(consumer, partitions):
+    if settings.MA_CHECKPOINT_ENABLED:
+        try:
+            # The previous owner checkpoints on revoke right before this, so read from the primary.
+            with sessionLocal() as db_session:
+                next_offsets = window_state.restore(db_session, [p.partition for p in partitions])
+            for p in partitions:
+                if p.partition in next_offsets:
+                    p.offset = next_offsets[p.partition]
+        except Exception as e:
+            logger.error(f"Failed to restore consumer state, falling back to PricePoint queries: {e}")
+    consumer.assign(partitions)
+    logger.info(f"Assigned partitions: {[p.partition for p in partitions]}")
+
+
+def on_revoke(consumer, partitions):
+    revoked = [p.partition for p in partitions]
+    checkpoint_state(revoked)
+    window_state.drop_partitions(revoked)
+    logger.info(f"Revoked partitions: {revoked}")
+
+
+def consume_memory_events():
+    logger.info("Consumer reading price events from the in-memory bus.")
+    # Keep going after shutdown is requested until the events already published are processed.
+    while running or len(memory_bus):
+        price_data = memory_bus.consume(timeout=1.0)
+        if price_data is None:
+            continue
+        with profiler.section("consumer_batch"):
+            try:
+                process_price_event(price_data)
+            except Exception as e:
+                logger.error(f"Error processing event: {e}")
+    logger.info("In-memory consumer stopped.")
 
 
 def consumer_price_event():
     consumer = Consumer(consumer_config)
     try:
-        consumer.subscribe([settings.KAFKA_PRICE_TOPIC])
+        consumer.subscribe([settings.KAFKA_PRICE_TOPIC], on_assign=on_assign, on_revoke=on_revoke)
         logger.info(f"Consumer subscribed to topic: {settings.KAFKA_PRICE_TOPIC}" )
+        last_pool_log = time.monotonic()
+        last_checkpoint = time.monotonic()
 
         while running:
+            if time.monotonic() - last_pool_log >= settings.DB_POOL_STATS_INTERVAL:
+                log_pool_stats()
+                last_pool_log = time.monotonic()
+            if time.monotonic() - last_checkpoint >= settings.MA_CHECKPOINT_INTERVAL:
+                checkpoint_state()
+                last_checkpoint = time.monotonic()
             msg = consumer.poll(1.0)
             if msg is None:
                 continue
@@ -107,24 +150,36 @@ def consumer_price_event():
                 elif msg.error():
                     raise KafkaException(msg.error())
             else:
-                try:
-                    price_data = json.loads(msg.value().decode('utf-8'))
-                    price_event = PricePoint.model_validate(price_data)
-
-                    logger.info(f"Received message for symbol: {price_event.symbol}, price: {price_event.price}, timestamp: {price_event.timestamp}")
-
-                    with sessionLocal() as db_session:
-                        calculate_and_store_moving_average(price_event.symbol, db_session)
-                except json.JSONDecodeError:
-                    logger.error(f"Failed to decode JSON message: {msg.value()}")
-                except Exception as e:
-                    logger.error(f"Error processing message: {e}")
+                # consumer.poll() hands out one message at a time, so a profiled batch is one message.
+                with profiler.section("consumer_batch"):
+                    try:
+                        price_data = json.loads(msg.value().decode('utf-8'))
+                        process_price_event(price_data, msg.partition(), msg.offset())
+                    except json.JSONDecodeError:
+                        logger.error(f"Failed to decode JSON message: {msg.value()}")
+                    except Exception as e:
+                        logger.error(f"Error processing message: {e}")
     except Exception as e:
         logger.error(f"Consumer error: {e}")
     finally:
+        checkpoint_state()
         consumer.close()
         logger.info("Consumer closed.")
 
 
+def main():
+    if settings.EVENT_BUS == "memory":
+        logger.error("EVENT_BUS=memory only works in-process; run scripts/EmbeddedPipeline.py instead.")
+        sys.exit(1)
+    signal.signal(signal.SIGINT, graceful_shutdown)
+    signal.signal(signal.SIGTERM, graceful_shutdown)
+    install_signal_toggle("consumer_batch")
+    get_engine()
+    try:
+        consumer_price_event()
+    finally:
+        dispose_engines()
+
+
 if __name__ == "__main__":
-    consumer_price_event()
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -4,43 +4,32 @@ import signal
 import sys
 import time
 import uuid
+from datetime import datetime, timedelta, timezone
 
-from sqlalchemy import create_engine, or_, func, Interval
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import or_, func, Interval
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from app.core.config import settings
+from app.core.db import sessionLocal, log_pool_stats, get_engine, dispose_engines, as_utc
+from app.core.profiling import profiler, install_signal_toggle
 from app.models.models import PollingJob, RawResponse, PricePoint
 from app.service.YFinance_service import YFinanceProvider
 
-from scripts.kafkaProducer import publish_price_event, flush_producer
+from scripts.kafkaProducer import publish_price_event, build_price_event, flush_producer, init_producer
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
-try:
-    engine = create_engine(settings.DATABASE_URL,
-                           connect_args={"options": "-c timezone=utc"})
-    sessionLocal = sessionmaker(autoflush=False, autocommit=False, bind=engine)
-    logger.info("Database connection established successfully.")
-except Exception as e:
-    logger.error(f"Failed to create database engine: {e}")
-    exit(1)
-
 running = True
 
 
-def graceful_shutdown():
+def graceful_shutdown(signum=None, frame=None):
     global running
     logger.info("Shutting down gracefully...")
     running = False
 
 
-signal.signal(signal.SIGINT, graceful_shutdown)
-signal.signal(signal.SIGTERM, graceful_shutdown)
-
-
 def execute_job(job: PollingJob, db_session):
     logger.info(f"Executing job {job.job_id} for symbols: {job.symbols}")
     # Create an instance of the selected provider
@@ -69,15 +58,7 @@ def execute_job(job: PollingJob, db_session):
                                          timestamp=timestamp, raw_response_id=new_raw_response.id)
 
             db_session.add(new_price_point)
-            new_price_event = {
-                "id": str(new_price_point.id),
-                "symbol": new_price_point.symbol,
-                "price": new_price_point.price,
-                "provider": new_price_point.provider,
-                "timestamp": new_price_point.timestamp.isoformat(),
-                "raw_response_id": str(new_price_point.raw_response_id)
-            }
-            events_to_publish.append(new_price_event)
+            events_to_publish.append(build_price_event(new_price_point))
         if len(events_to_publish) == 0:
             logger.info(f"No data to publish for job {job.job_id}. Skipping commit.")
             return
@@ -97,26 +78,44 @@ def execute_job(job: PollingJob, db_session):
         db_session.rollback()
 
 
+def find_due_jobs(db_session):
+    if db_session.get_bind().dialect.name == "postgresql":
+        return db_session.query(PollingJob).filter(PollingJob.is_active, or_(PollingJob.last_run_at == None,
+                                                                             func.now() >= PollingJob.last_run_at + (
+                                                                                     PollingJob.interval * func.cast(
+                                                                                 "1 second",
+                                                                                 Interval)))).all()
+
+    # Databases without interval arithmetic (SQLite in embedded mode) filter in Python.
+    now = datetime.now(timezone.utc)
+    due_jobs = []
+    for job in db_session.query(PollingJob).filter(PollingJob.is_active).all():
+        if job.last_run_at is None or now >= as_utc(job.last_run_at) + timedelta(seconds=job.interval):
+            due_jobs.append(job)
+    return due_jobs
+
+
 def poll_for_jobs():
     logger.info("Poller service started.")
+    last_pool_log = time.monotonic()
 
     while running:
-        try:
-            with sessionLocal() as db_session:
-                due_jobs = db_session.query(PollingJob).filter(PollingJob.is_active, or_(PollingJob.last_run_at == None,
-                                                                                         func.now() >= PollingJob.last_run_at + (
-                                                                                                     PollingJob.interval * func.cast(
-                                                                                                 "1 second",
-                                                                                                 Interval)))).all()
-                if due_jobs:
-                    logger.info(f"Found {len(due_jobs)} due jobs to execute.")
-                    for job in due_jobs:
-                        execute_job(job, db_session)
-                else:
-                    logger.info("No due jobs found. Waiting for the next poll interval.")
-
-        except Exception as e:
-            logger.error(f"An error occurred while polling for jobs: {e}")
+        with profiler.section("poll_cycle"):
+            try:
+                with sessionLocal() as db_session:
+                    due_jobs = find_due_jobs(db_session)
+                    if due_jobs:
+                        logger.info(f"Found {len(due_jobs)} due jobs to execute.")
+                        for job in due_jobs:
+                            execute_job(job, db_session)
+                    else:
+                        logger.info("No due jobs found. Waiting for the next poll interval.")
+
+            except Exception as e:
+                logger.error(f"An error occurred while polling for jobs: {e}")
+        if time.monotonic() - last_pool_log >= settings.DB_POOL_STATS_INTERVAL:
+            log_pool_stats()
+            last_pool_log = time.monotonic()
 
         for _ in range(settings.POLLING_INTERVAL):
             if not running:
@@ -128,5 +127,17 @@ def poll_for_jobs():
     logger.info("Poller service shutdown complete.")
 
 
+def main():
+    signal.signal(signal.SIGINT, graceful_shutdown)
+    signal.signal(signal.SIGTERM, graceful_shutdown)
+    install_signal_toggle("poll_cycle")
+    get_engine()
+    init_producer()
+    try:
+        poll_for_jobs()
+    finally:
+        dispose_engines()
+
+
 if __name__ == "__main__":
-    poll_for_jobs()
+    main()
@@ -0,0 +1,67 @@
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.core.db import readSessionLocal
+from app.service.export_service import (DEFAULT_CHUNK_SIZE, OHLC_SCHEMA, PRICE_SCHEMA, export_parquet,
+                                        iter_arrow_ipc_stream, iter_ohlc_tables, iter_price_batches)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def export_arrow(db_session, out: str, dataset: str, chunk_size: int, symbols: list[str] | None):
+    batches = iter_price_batches(db_session, chunk_size, symbols=symbols)
+    if dataset == "ohlc":
+        stream = iter_arrow_ipc_stream(iter_ohlc_tables(batches), OHLC_SCHEMA)
+    else:
+        stream = iter_arrow_ipc_stream(batches, PRICE_SCHEMA)
+
+    sink = sys.stdout.buffer if out == "-" else open(out, "wb")
+    try:
+        for chunk in stream:
+            sink.write(chunk)
+    finally:
+        if sink is not sys.stdout.buffer:
+            sink.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export price history as partitioned Parquet or an Arrow IPC stream.")
+    parser.add_argument("--out", required=True,
+                        help="Output directory for parquet, or file path ('-' for stdout) for arrow.")
+    parser.add_argument("--format", choices=["parquet", "arrow"], default="parquet")
+    parser.add_argument("--dataset", choices=["prices", "ohlc"], default="prices",
+                        help="Dataset to stream in arrow format (parquet always writes prices and ohlc).")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only export rows created after the watermark stored in the output directory "
+                             "(parquet only, all symbols).")
+    parser.add_argument("--lag", type=float,
+                        help="Only export rows created at least this many seconds ago "
+                             "(parquet only, default: EXPORT_WATERMARK_LAG).")
+    parser.add_argument("--no-ohlc", action="store_true", help="Skip the daily OHLC dataset (parquet only).")
+    parser.add_argument("--symbols", nargs="*", help="Only export these symbols (default: all).")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Rows per cursor fetch.")
+    args = parser.parse_args()
+
+    if args.format == "arrow" and (args.incremental or args.lag is not None):
+        parser.error("--incremental and --lag only apply to --format parquet")
+    if args.incremental and args.symbols:
+        parser.error("--symbols cannot be combined with --incremental: the watermark covers every symbol")
+
+    started = time.perf_counter()
+    with readSessionLocal() as db_session:
+        if args.format == "parquet":
+            export_parquet(db_session, args.out, incremental=args.incremental, include_ohlc=not args.no_ohlc,
+                           chunk_size=args.chunk_size, symbols=args.symbols, lag=args.lag)
+        else:
+            export_arrow(db_session, args.out, args.dataset, args.chunk_size, args.symbols)
+    logger.info(f"Export finished in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
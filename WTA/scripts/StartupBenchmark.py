@@ -0,0 +1,84 @@
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+IMPORT_TARGETS = ["app.api.api", "scripts.Poller", "scripts.MAConsumer"]
+
+IMPORT_SNIPPET = """
+import time
+started = time.perf_counter()
+import {module}
+print(time.perf_counter() - started)
+"""
+
+
+def measure_import(module: str) -> float:
+    """Import ``module`` in a fresh interpreter and return the import time in seconds."""
+    output = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET.format(module=module)], cwd=ROOT, check=True,
+                            capture_output=True, text=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_ready_to_serve(timeout: float) -> float:
+    """Start the API with uvicorn and return the seconds until it answers its first request.
+    The lifespan (database init, producer warm-up) must finish before uvicorn accepts requests."""
+    port = _free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-m", "uvicorn", "app.api.api:app", "--port", str(port),
+                                "--log-level", "warning"], cwd=ROOT, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - started < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f"API exited with code {process.returncode} before becoming ready")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/openapi.json", timeout=1):
+                    return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.02)
+        raise TimeoutError(f"API was not ready within {timeout}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import and ready-to-serve latency of the services.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--skip-serve", action="store_true", help="Only measure import times.")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--json", help="Append the results as one JSON line to this file to track them over time.")
+    args = parser.parse_args()
+
+    results = {}
+    for module in IMPORT_TARGETS:
+        results[f"import:{module}"] = [measure_import(module) for _ in range(args.runs)]
+    if not args.skip_serve:
+        results["ready_to_serve:api"] = [measure_ready_to_serve(args.timeout) for _ in range(args.runs)]
+
+    summary = {name: {"median_ms": round(statistics.median(samples) * 1000, 1),
+                      "max_ms": round(max(samples) * 1000, 1)} for name, samples in results.items()}
+    for name, stats in summary.items():
+        print(f"{name:<32} median {stats['median_ms']:>8.1f} ms   max {stats['max_ms']:>8.1f} ms")
+
+    if args.json:
+        with open(args.json, "a") as f:
+            f.write(json.dumps({"timestamp": time.time(), "runs": args.runs, "results": summary}) + "\n")
+
+
+if __name__ == "__main__":
+    main()
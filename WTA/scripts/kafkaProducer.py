@@ -1,8 +1,10 @@
 import json
 import logging
+import threading
 
 from confluent_kafka import Producer
 
+from app.core.bus import memory_bus
 from app.core.config import settings
 from app.models.models import PricePoint
 
@@ -13,12 +15,27 @@ producer_config = {
     'bootstrap.servers': settings.KAFKA_BOOTSTRAP_SERVERS
 }
 
-try:
-    producer = Producer(producer_config)
-    logger.info("Kafka Producer initialized successfully.")
-except Exception as e:
-    logger.error(f"Failed to initialize Kafka Producer: {e}")
-    producer = None
+# Created on first use (or by init_producer from a service's startup hook) rather than on import.
+producer = None
+_producer_lock = threading.Lock()
+
+
+def get_producer():
+    global producer
+    if producer is None and settings.EVENT_BUS == "kafka":
+        with _producer_lock:
+            if producer is None:
+                try:
+                    producer = Producer(producer_config)
+                    logger.info("Kafka Producer initialized successfully.")
+                except Exception as e:
+                    logger.error(f"Failed to initialize Kafka Producer: {e}")
+    return producer
+
+
+def init_producer():
+    if settings.EVENT_BUS == "kafka":
+        get_producer()
 
 
 def delivery_report(err, msg):
@@ -28,7 +45,23 @@ def delivery_report(err, msg):
         logger.info(f"Message delivered to {msg.topic()} [{msg.partition()}] at offset {msg.offset()}")
 
 
+def build_price_event(price_point: PricePoint):
+    return {
+        "id": str(price_point.id),
+        "price": price_point.price,
+        "symbol": price_point.symbol,
+        "provider": price_point.provider,
+        "timestamp": price_point.timestamp.isoformat(),
+        "raw_response_id": str(price_point.raw_response_id)
+    }
+
+
 def publish_price_event(price_event):
+    if settings.EVENT_BUS == "memory":
+        memory_bus.publish(price_event)
+        return
+
+    producer = get_producer()
     if producer is None:
         logger.error("Kafka Producer is not initialized.")
         return
@@ -53,6 +86,8 @@ def publish_price_event(price_event):
 
 
 def flush_producer():
+    if settings.EVENT_BUS == "memory":
+        return
     if producer is not None:
         try:
             producer.flush()
@@ -60,4 +95,4 @@ def flush_producer():
         except Exception as e:
             logger.error(f"Failed to flush Producer: {e}")
     else:
-        logger.error("Kafka Producer is not initialized, cannot flush.")
+        logger.info("Kafka Producer was never initialized, nothing to flush.")
@@ -0,0 +1,45 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+
+class FakeResult:
+    def __init__(self, rows, size):
+        self.rows = rows
+        self.size = size
+
+    def partitions(self):
+        for start in range(0, len(self.rows), self.size):
+            yield self.rows[start:start + self.size]
+
+
+class FakeSession:
+    """Session whose execute() returns ``rows`` as a streamed result, ``size`` rows per partition."""
+
+    def __init__(self, rows, size=3):
+        self.rows = rows
+        self.size = size
+        self.statements = []
+
+    def execute(self, stmt):
+        self.statements.append(stmt)
+        return FakeResult(self.rows, self.size)
+
+
+def make_price_rows(symbol: str, prices: list[float], start: datetime = datetime(2024, 1, 1, tzinfo=timezone.utc),
+                    step: timedelta = timedelta(minutes=1)):
+    """PricePoint rows as (id, symbol, price, provider, timestamp, raw_response_id, created_at)."""
+    created_at = datetime(2024, 1, 10, tzinfo=timezone.utc)
+    return [(uuid.uuid4(), symbol, price, "yfinance", start + step * i, uuid.uuid4(),
+             created_at + timedelta(seconds=i)) for i, price in enumerate(prices)]
+
+
+@pytest.fixture
+def fake_session():
+    return FakeSession
+
+
+@pytest.fixture
+def price_rows():
+    return make_price_rows
@@ -1,5 +1,7 @@
 import os
 import sys
+import uuid
+from datetime import datetime, timezone
 
 import pytest
 from fastapi.testclient import TestClient
@@ -8,11 +10,11 @@ from sqlmodel import Session, SQLModel, select
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from app.core.db import get_session
+from app.core.db import get_session, get_read_session
 from app.api.api import app
 
 from app.core.config import settings
-from app.models.models import PollingJob, RawResponse
+from app.models.models import PollingJob, RawResponse, PricePoint, SymbolAverage
 
 engine = create_engine(settings.TEST_DATABASE_URL)
 
@@ -23,6 +25,7 @@ def override_get_session():
 
 
 app.dependency_overrides[get_session] = override_get_session
+app.dependency_overrides[get_read_session] = override_get_session
 
 
 @pytest.fixture(scope="session", autouse=True)
@@ -94,3 +97,42 @@ def test_create_polling_job(test_client: TestClient):
 
         assert job is not None
         assert job.symbols == ["AAPL", "GOOGL"]
+
+
+def test_get_latest_prices_batch(test_client: TestClient, mocker):
+    mocker.patch("app.service.YFinance_service.YFinanceProvider.fetch_price_data", return_value=None)
+    response_id = uuid.uuid4()
+    with Session(engine) as db_session:
+        db_session.add(RawResponse(id=response_id, provider="yfinance", symbol="BATCH1",
+                                   response_data={"regularMarketPrice": 42.0}))
+        db_session.flush()
+        db_session.add(PricePoint(id=uuid.uuid4(), symbol="BATCH1", price=42.0, provider="yfinance",
+                                  timestamp=datetime.now(timezone.utc), raw_response_id=response_id))
+        db_session.commit()
+
+    response = test_client.get("/prices/latest", params={"symbols": "BATCH1,FAKE"})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert [p["symbol"] for p in data["prices"]] == ["BATCH1"]
+    assert data["prices"][0]["price"] == 42.0
+    assert data["missing"] == ["FAKE"]
+
+
+def test_get_averages_batch_with_etag(test_client: TestClient):
+    with Session(engine) as db_session:
+        db_session.merge(SymbolAverage(symbol="BATCH2", moving_average=10.5,
+                                       last_updated_at=datetime(2024, 1, 1, tzinfo=timezone.utc)))
+        db_session.commit()
+
+    response = test_client.get("/averages", params={"symbols": "BATCH2,NOPE"})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["averages"][0]["symbol"] == "BATCH2"
+    assert data["averages"][0]["moving_average"] == 10.5
+    assert data["missing"] == ["NOPE"]
+
+    etag = response.headers["etag"]
+    cached = test_client.get("/averages", params={"symbols": "BATCH2,NOPE"}, headers={"If-None-Match": etag})
+    assert cached.status_code == 304
@@ -0,0 +1,72 @@
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from fastapi import HTTPException
+from sqlmodel import Session, SQLModel, create_engine
+
+from app.core.config import settings
+from app.models.models import PricePoint
+from app.service import batch_service
+
+
+def fake_refresh(delays: dict):
+    def refresh(symbol, session, provider):
+        time.sleep(delays.get(symbol, 0))
+        if symbol == "NONE":
+            raise HTTPException(status_code=404, detail=f"No data found for symbol: {symbol}")
+        return {"price": 1.0, "symbol": symbol, "timestamp": datetime.now(timezone.utc), "provider": provider}
+    return refresh
+
+
+def test_stale_symbols_are_refreshed_concurrently(mocker):
+    mocker.patch.object(batch_service, "get_latest_stored_prices", return_value={})
+    mocker.patch.object(batch_service, "store_raw_response_and_return_price_point",
+                        side_effect=fake_refresh({"AAPL": 0.3, "MSFT": 0.3, "TSLA": 0.3}))
+
+    started = time.perf_counter()
+    result = batch_service.get_latest_prices(["AAPL", "MSFT", "TSLA", "NONE"], "yfinance", None,
+                                             Session(create_engine("sqlite://")))
+
+    assert time.perf_counter() - started < 0.8
+    assert [price["symbol"] for price in result["prices"]] == ["AAPL", "MSFT", "TSLA"]
+    assert result["missing"] == ["NONE"]
+
+
+def test_refresh_past_the_time_cap_serves_stored_value_or_missing(mocker):
+    mocker.patch.object(settings, "LATEST_PRICE_REFRESH_TIMEOUT", 0.2)
+    old = datetime.now(timezone.utc) - timedelta(hours=1)
+    stored = SimpleNamespace(symbol="SLOW", price=42.0, provider="yfinance", created_at=old)
+    mocker.patch.object(batch_service, "get_latest_stored_prices", return_value={"SLOW": stored})
+    mocker.patch.object(batch_service, "store_raw_response_and_return_price_point",
+                        side_effect=fake_refresh({"SLOW": 1.0, "GONE": 1.0}))
+
+    result = batch_service.get_latest_prices(["SLOW", "GONE", "FAST"], "yfinance", None,
+                                             Session(create_engine("sqlite://")))
+
+    assert [(price["symbol"], price["price"]) for price in result["prices"]] == [("SLOW", 42.0), ("FAST", 1.0)]
+    assert result["missing"] == ["GONE"]
+
+
+def test_latest_stored_prices_pick_newest_point_per_symbol():
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    with Session(engine) as session:
+        session.add_all([
+            PricePoint(id=uuid.uuid4(), symbol="AAPL", price=1.0, provider="yfinance", timestamp=start,
+                       raw_response_id=uuid.uuid4(), created_at=start),
+            PricePoint(id=uuid.uuid4(), symbol="AAPL", price=2.0, provider="yfinance", timestamp=start + timedelta(1),
+                       raw_response_id=uuid.uuid4(), created_at=start + timedelta(1)),
+            # Same market timestamp polled again later: the newer fetch wins.
+            PricePoint(id=uuid.uuid4(), symbol="AAPL", price=3.0, provider="yfinance", timestamp=start + timedelta(1),
+                       raw_response_id=uuid.uuid4(), created_at=start + timedelta(2)),
+            PricePoint(id=uuid.uuid4(), symbol="MSFT", price=4.0, provider="yfinance", timestamp=start,
+                       raw_response_id=uuid.uuid4(), created_at=start),
+        ])
+        session.commit()
+
+        latest = batch_service.get_latest_stored_prices(["AAPL", "MSFT", "TSLA"], session)
+
+    assert {symbol: row.price for symbol, row in latest.items()} == {"AAPL": 3.0, "MSFT": 4.0}
@@ -0,0 +1,89 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import SQLModel, Session, select
+
+import scripts.MAConsumer as ma_consumer
+from app.core.bus import InMemoryBus
+from app.core.config import settings
+from app.models.models import PricePoint, SymbolAverage, PollingJob
+from scripts.kafkaProducer import publish_price_event, build_price_event
+from scripts.Poller import find_due_jobs
+
+
+@pytest.fixture
+def sqlite_session_factory(tmp_path, mocker):
+    engine = create_engine(f"sqlite:///{tmp_path / 'embedded.db'}")
+    SQLModel.metadata.create_all(engine)
+    factory = sessionmaker(autoflush=False, autocommit=False, bind=engine)
+    mocker.patch.object(ma_consumer, "sessionLocal", factory)
+    return factory
+
+
+def test_in_memory_bus_drops_events_when_full():
+    bus = InMemoryBus(max_size=1, publish_timeout=0.01)
+
+    assert bus.publish({"symbol": "AAPL"}) is True
+    assert bus.publish({"symbol": "MSFT"}) is False
+    assert bus.consume(timeout=0.01) == {"symbol": "AAPL"}
+    assert bus.consume(timeout=0.01) is None
+
+
+def test_events_flow_from_publisher_to_consumer_on_sqlite(sqlite_session_factory, mocker):
+    mocker.patch.object(settings, "EVENT_BUS", "memory")
+    bus = InMemoryBus(max_size=10)
+    mocker.patch("scripts.kafkaProducer.memory_bus", bus)
+    prices = [100.0, 102.0, 104.0, 106.0, 108.0]
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    with sqlite_session_factory() as session:
+        points = [PricePoint(id=uuid.uuid4(), symbol="PYPL", price=p, provider="yfinance",
+                             timestamp=start + timedelta(minutes=i), raw_response_id=uuid.uuid4())
+                  for i, p in enumerate(prices)]
+        events = [build_price_event(point) for point in points]
+        session.add_all(points)
+        session.commit()
+
+    for event in events:
+        publish_price_event(event)
+    while len(bus):
+        ma_consumer.process_price_event(bus.consume(timeout=0.01))
+
+    with Session(sqlite_session_factory.kw["bind"]) as session:
+        result = session.exec(select(SymbolAverage).where(SymbolAverage.symbol == "PYPL")).first()
+    assert result is not None
+    assert result.moving_average == pytest.approx(sum(prices) / len(prices))
+
+
+def test_find_due_jobs_without_interval_arithmetic(sqlite_session_factory):
+    now = datetime.now(timezone.utc)
+    with sqlite_session_factory() as session:
+        session.add_all([
+            PollingJob(job_id=uuid.uuid4(), symbols=["AAPL"], provider="yfinance", interval=60),
+            PollingJob(job_id=uuid.uuid4(), symbols=["MSFT"], provider="yfinance", interval=60,
+                       last_run_at=now - timedelta(seconds=120)),
+            PollingJob(job_id=uuid.uuid4(), symbols=["TSLA"], provider="yfinance", interval=60,
+                       last_run_at=now - timedelta(seconds=10)),
+        ])
+        session.commit()
+
+        due = find_due_jobs(session)
+
+    assert sorted(job.symbols[0] for job in due) == ["AAPL", "MSFT"]
+
+
+def test_memory_consumer_drains_the_bus_after_shutdown(mocker):
+    bus = InMemoryBus(max_size=10)
+    mocker.patch.object(ma_consumer, "memory_bus", bus)
+    mocker.patch.object(ma_consumer, "running", False)
+    process = mocker.patch.object(ma_consumer, "process_price_event")
+    for i in range(3):
+        bus.publish({"symbol": "AAPL", "price": 100.0 + i})
+
+    ma_consumer.consume_memory_events()
+
+    assert process.call_count == 3
+    assert len(bus) == 0
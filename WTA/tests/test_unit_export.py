@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta, timezone
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from app.service.export_service import (PRICE_SCHEMA, export_parquet, iter_arrow_ipc_stream, iter_ohlc_tables,
+                                        iter_price_batches, read_watermark)
+
+
+@pytest.fixture
+def rows(price_rows):
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    return (price_rows("AAPL", [10.0, 12.0, 9.0, 11.0, 13.0, 14.0], start, timedelta(hours=6))
+            + price_rows("MSFT", [20.0, 21.0], start, timedelta(hours=6)))
+
+
+def test_ohlc_bars_span_batch_boundaries(fake_session, rows):
+    bars = pa.concat_tables(iter_ohlc_tables(iter_price_batches(fake_session(rows, size=3)))).to_pylist()
+
+    assert [(b["symbol"], b["date"].isoformat()) for b in bars] == [
+        ("AAPL", "2024-01-01"), ("AAPL", "2024-01-02"), ("MSFT", "2024-01-01")]
+    assert bars[0] == {"symbol": "AAPL", "date": bars[0]["date"], "open": 10.0, "high": 12.0, "low": 9.0,
+                       "close": 11.0, "count": 4}
+    assert (bars[1]["open"], bars[1]["close"], bars[1]["count"]) == (13.0, 14.0, 2)
+
+
+def test_arrow_ipc_stream_round_trips(fake_session, rows):
+    payload = b"".join(iter_arrow_ipc_stream(iter_price_batches(fake_session(rows)), PRICE_SCHEMA))
+
+    table = pa.ipc.open_stream(payload).read_all()
+
+    assert table.num_rows == len(rows)
+    assert table["symbol"].to_pylist()[-1] == "MSFT"
+
+
+def test_parquet_export_is_partitioned_and_records_watermark(tmp_path, fake_session, rows):
+    exported, watermark = export_parquet(fake_session(rows), str(tmp_path))
+
+    assert exported == len(rows)
+    assert read_watermark(str(tmp_path)) == watermark == max(r[6] for r in rows)
+    assert (tmp_path / "prices" / "date=2024-01-02" / "symbol=AAPL").is_dir()
+    assert pq.read_table(tmp_path / "prices").num_rows == len(rows)
+    assert pq.read_table(tmp_path / "ohlc").num_rows == 3
+
+    session = fake_session([])
+    export_parquet(session, str(tmp_path), incremental=True)
+    assert "created_at >" in str(session.statements[0])
+    assert "created_at <=" in str(session.statements[0])
+
+
+def test_incremental_export_rebuilds_bars_of_days_spanning_runs(tmp_path, fake_session, rows):
+    export_parquet(fake_session(rows[:2]), str(tmp_path))
+    export_parquet(fake_session(rows[2:]), str(tmp_path), incremental=True)
+
+    bars = sorted(pq.read_table(tmp_path / "ohlc").to_pylist(), key=lambda b: (b["symbol"], str(b["date"])))
+
+    assert [(b["symbol"], str(b["date"]), b["count"]) for b in bars] == [
+        ("AAPL", "2024-01-01", 4), ("AAPL", "2024-01-02", 2), ("MSFT", "2024-01-01", 2)]
+    assert (bars[0]["open"], bars[0]["high"], bars[0]["low"], bars[0]["close"]) == (10.0, 12.0, 9.0, 11.0)
+    assert pq.read_table(tmp_path / "prices").num_rows == len(rows)
+
+
+def test_full_export_replaces_previous_export(tmp_path, fake_session, rows):
+    export_parquet(fake_session(rows), str(tmp_path))
+    export_parquet(fake_session(rows), str(tmp_path))
+
+    assert pq.read_table(tmp_path / "prices").num_rows == len(rows)
+    assert sum(pq.read_table(tmp_path / "ohlc")["count"].to_pylist()) == len(rows)
+    assert [p.name for p in tmp_path.iterdir() if p.name.startswith(".staging")] == []
+
+
+def test_symbol_filtered_exports_do_not_advance_the_watermark(tmp_path, fake_session, rows):
+    export_parquet(fake_session(rows), str(tmp_path))
+
+    with pytest.raises(ValueError):
+        export_parquet(fake_session(rows[:2]), str(tmp_path), incremental=True, symbols=["AAPL"])
+    exported, watermark = export_parquet(fake_session(rows[:2]), str(tmp_path), symbols=["AAPL"])
+
+    assert (exported, watermark) == (2, None)
+    assert read_watermark(str(tmp_path)) is None
+    session = fake_session([])
+    export_parquet(session, str(tmp_path), incremental=True)
+    assert "created_at >" not in str(session.statements[0])
@@ -0,0 +1,89 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app.models.models import PricePoint, SymbolAverage
+from scripts.MABackfill import rolling_mean, compute_segment, iter_segments, store_averages
+
+
+def segment_rows(rows):
+    """(symbol, timestamp, price) as selected by iter_segments."""
+    return [(symbol, timestamp, price) for _, symbol, price, _, timestamp, _, _ in rows]
+
+
+def test_rolling_mean_matches_naive_average():
+    prices = np.array([100.0, 102.0, 104.0, 106.0, 108.0, 110.0])
+
+    means = rolling_mean(prices, 5)
+
+    assert means.tolist() == pytest.approx([104.0, 106.0])
+    assert len(rolling_mean(prices[:4], 5)) == 0
+
+
+def test_compute_segment_returns_latest_value_and_history(price_rows):
+    rows = segment_rows(price_rows("AAPL", [100.0, 102.0, 104.0, 106.0, 108.0, 110.0]))
+    timestamps = [r[1] for r in rows]
+
+    symbol, ma_value, timestamp, history = compute_segment("AAPL", timestamps, np.array([r[2] for r in rows]), 5, True)
+
+    assert symbol == "AAPL"
+    assert ma_value == pytest.approx(106.0)
+    assert timestamp == timestamps[-1]
+    assert [ts for ts, _ in history] == timestamps[4:]
+
+
+def test_split_segments_produce_the_same_series_as_one_pass(fake_session, price_rows):
+    window = 5
+    prices = [float(p) for p in range(1, 24)]
+    rows = segment_rows(price_rows("MSFT", prices) + price_rows("TSLA", [1.0, 2.0, 3.0]))
+
+    series = []
+    for symbol, timestamps, segment_prices in iter_segments(fake_session(rows, size=4), window, chunk_size=7):
+        _, _, _, history = compute_segment(symbol, timestamps, segment_prices, window, True)
+        series.extend((symbol, value) for _, value in history or [])
+
+    expected = [("MSFT", value) for value in rolling_mean(np.array(prices), window).tolist()]
+    assert series == [(s, pytest.approx(v)) for s, v in expected]
+
+
+def test_store_averages_removes_symbols_without_a_full_window():
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    old = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    with Session(engine) as session:
+        session.add_all([SymbolAverage(symbol=symbol, moving_average=1.0, last_updated_at=old)
+                         for symbol in ("AAPL", "MSFT", "TSLA")])
+        session.commit()
+
+        removed = store_averages(session, {"AAPL": (2.0, old + timedelta(days=1))}, 5, symbols=["AAPL", "MSFT"])
+
+        assert removed == 1
+        averages = {row.symbol: row.moving_average for row in session.exec(select(SymbolAverage))}
+        assert averages == {"AAPL": 2.0, "TSLA": 1.0}
+
+        store_averages(session, {"AAPL": (3.0, old + timedelta(days=2))}, 5)
+
+        assert [row.symbol for row in session.exec(select(SymbolAverage))] == ["AAPL"]
+
+
+def test_store_averages_keeps_values_written_on_the_primary_during_the_run():
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    old = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    with Session(engine) as session:
+        # The consumer stored a newer AAPL average, and TSLA reached a full window after the snapshot.
+        session.add(SymbolAverage(symbol="AAPL", moving_average=5.0, last_updated_at=old + timedelta(days=2)))
+        session.add(SymbolAverage(symbol="TSLA", moving_average=7.0, last_updated_at=old))
+        session.add_all([PricePoint(id=uuid.uuid4(), symbol="TSLA", price=7.0, provider="yfinance",
+                                    timestamp=old + timedelta(minutes=i), raw_response_id=uuid.uuid4())
+                         for i in range(5)])
+        session.commit()
+
+        removed = store_averages(session, {"AAPL": (2.0, old + timedelta(days=1))}, 5)
+
+        assert removed == 0
+        averages = {row.symbol: row.moving_average for row in session.exec(select(SymbolAverage))}
+        assert averages == {"AAPL": 5.0, "TSLA": 7.0}
@@ -0,0 +1,81 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import SQLModel
+
+from app.service.moving_average_state import RollingWindow, WindowState
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'state.db'}")
+    SQLModel.metadata.create_all(engine)
+    return sessionmaker(autoflush=False, autocommit=False, bind=engine)
+
+
+def feed(state: WindowState, symbol: str, prices: list[float], partition: int, first_offset: int):
+    result = None
+    for i, price in enumerate(prices):
+        result = state.apply(symbol, START + timedelta(minutes=i), uuid.uuid4(), price, partition, first_offset + i)
+    return result
+
+
+def test_rolling_window_ignores_replays_and_stale_points():
+    window = RollingWindow(3)
+    ids = [uuid.uuid4() for _ in range(4)]
+    for i, point_id in enumerate(ids):
+        window.add(START + timedelta(minutes=i), point_id, float(i))
+
+    assert window.add(START + timedelta(minutes=3), ids[3], 3.0) is False
+    assert window.add(START - timedelta(minutes=1), uuid.uuid4(), 100.0) is False
+    assert window.add(START + timedelta(minutes=3), uuid.uuid4(), 3.0) is True
+    assert window.moving_average() == (pytest.approx((2.0 + 3.0 + 3.0) / 3), START + timedelta(minutes=3))
+
+
+def test_checkpoint_restores_windows_and_offsets_in_bulk(session_factory):
+    state = WindowState(window_size=5, topic="price_topic")
+    expected = feed(state, "AAPL", [100.0, 102.0, 104.0, 106.0, 108.0, 110.0], partition=0, first_offset=10)
+    feed(state, "MSFT", [1.0, 2.0], partition=1, first_offset=40)
+
+    with session_factory() as session:
+        assert state.checkpoint(session) == 2
+
+    restored = WindowState(window_size=5, topic="price_topic")
+    with session_factory() as session:
+        next_offsets = restored.restore(session, [0])
+
+    assert next_offsets == {0: 16}
+    assert "AAPL" in restored and "MSFT" not in restored
+    assert restored.windows["AAPL"].moving_average() == expected
+    assert restored.apply("AAPL", START + timedelta(minutes=6), uuid.uuid4(), 112.0, 0, 16)[0] == pytest.approx(108.0)
+
+
+def test_restore_skips_windows_of_a_different_size(session_factory):
+    state = WindowState(window_size=3, topic="price_topic")
+    feed(state, "AAPL", [1.0, 2.0, 3.0], partition=0, first_offset=0)
+    with session_factory() as session:
+        state.checkpoint(session)
+
+    resized = WindowState(window_size=5, topic="price_topic")
+    with session_factory() as session:
+        assert resized.restore(session, [0]) == {0: 3}
+    assert "AAPL" not in resized
+
+
+def test_revoked_partitions_are_checkpointed_and_dropped(session_factory):
+    state = WindowState(window_size=2, topic="price_topic")
+    feed(state, "AAPL", [1.0, 2.0], partition=0, first_offset=0)
+    feed(state, "MSFT", [3.0, 4.0], partition=1, first_offset=0)
+
+    with session_factory() as session:
+        assert state.checkpoint(session, partitions=[1]) == 1
+    state.drop_partitions([1])
+
+    assert "MSFT" not in state and "AAPL" in state
+    with session_factory() as session:
+        assert state.checkpoint(session) == 1
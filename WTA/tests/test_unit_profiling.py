@@ -0,0 +1,89 @@
+import threading
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.core.profiling import Profiler
+
+
+def busy_work(seconds: float):
+    deadline = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < deadline:
+        total += sum(range(100))
+    return total
+
+
+def test_section_is_a_noop_while_not_armed(tmp_path):
+    profiler = Profiler(str(tmp_path), interval=0.001)
+
+    assert profiler.section("poll_cycle") is profiler.section("request")
+    with profiler.section("poll_cycle"):
+        busy_work(0.01)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_armed_sections_write_one_collapsed_stack_file(tmp_path):
+    profiler = Profiler(str(tmp_path), interval=0.001)
+    profiler.arm("poll_cycle", 2)
+
+    for _ in range(3):
+        with profiler.section("poll_cycle"):
+            busy_work(0.05)
+
+    assert not profiler.is_armed("poll_cycle")
+    assert len(profiler.written) == 1
+    lines = open(profiler.written[0]).read().splitlines()
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) > 0
+    assert any("busy_work" in line for line in lines)
+    assert stack.startswith("MainThread;")
+
+
+def test_disarm_flushes_partial_capture(tmp_path):
+    profiler = Profiler(str(tmp_path), interval=0.001)
+    profiler.arm("request", 5)
+
+    with profiler.section("request", all_threads=True):
+        busy_work(0.05)
+    profiler.disarm("request")
+
+    assert profiler.status() == {"armed": {}, "written": profiler.written}
+    assert len(profiler.written) == 1
+
+
+def test_arm_rejects_unknown_targets_and_non_positive_counts(tmp_path):
+    profiler = Profiler(str(tmp_path), interval=0.001)
+
+    with pytest.raises(ValueError):
+        profiler.arm("poll_cylce", 3)
+    with pytest.raises(ValueError):
+        profiler.arm("poll_cycle", 0)
+    assert profiler.status()["armed"] == {}
+
+
+def test_invalid_profile_targets_are_ignored(tmp_path, mocker):
+    mocker.patch.object(settings, "PROFILE_DIR", str(tmp_path))
+    mocker.patch.object(settings, "PROFILE_TARGETS", "request:abc,poll_cylce:2,consumer_batch:-1,poll_cycle:2")
+
+    profiler = Profiler.from_settings()
+
+    assert profiler.status()["armed"] == {"poll_cycle": {"remaining": 2, "active": 0}}
+
+
+def test_signal_requests_are_applied_by_the_next_section(tmp_path):
+    profiler = Profiler(str(tmp_path), interval=0.001)
+
+    # A signal can interrupt the thread while it holds the profiler lock.
+    with profiler._lock:
+        requester = threading.Thread(target=lambda: [profiler.request_arm("consumer_batch", 1),
+                                                     profiler.request_arm("consumer_batch", 0)])
+        requester.start()
+        requester.join(timeout=1)
+        assert not requester.is_alive()
+
+    with profiler.section("consumer_batch"):
+        busy_work(0.02)
+    assert len(profiler.written) == 1
+    assert profiler.status()["armed"] == {}
@@ -0,0 +1,96 @@
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app.models.models import RawResponse, PricePoint
+from app.service.write_behind import WriteBehindBuffer
+
+
+class FakeSession:
+    def __init__(self, store):
+        self.store = store
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def add_all(self, items):
+        self.store.extend(items)
+
+    def flush(self):
+        pass
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+def make_pair(symbol: str, price: float):
+    response_id = uuid.uuid4()
+    raw = RawResponse(id=response_id, provider="yfinance", symbol=symbol, response_data={"regularMarketPrice": price})
+    point = PricePoint(id=uuid.uuid4(), symbol=symbol, price=price, provider="yfinance",
+                       timestamp=datetime.now(timezone.utc), raw_response_id=response_id)
+    return raw, point
+
+
+def test_write_behind_flushes_queue_on_stop(mocker):
+    published = mocker.patch("app.service.write_behind.publish_price_event")
+    mocker.patch("app.service.write_behind.flush_producer")
+    stored = []
+    buffer = WriteBehindBuffer(max_size=100, batch_size=10, flush_interval=5.0, enqueue_timeout=0.1,
+                               session_factory=lambda: FakeSession(stored))
+    buffer.start()
+
+    for i in range(25):
+        assert buffer.submit(*make_pair("AAPL", 100.0 + i)) is True
+    buffer.stop()
+
+    assert len([item for item in stored if isinstance(item, PricePoint)]) == 25
+    assert len([item for item in stored if isinstance(item, RawResponse)]) == 25
+    assert published.call_count == 25
+    assert published.call_args_list[0].args[0]["symbol"] == "AAPL"
+
+
+def test_write_behind_rejects_when_full_or_stopped(mocker):
+    buffer = WriteBehindBuffer(max_size=1, batch_size=10, flush_interval=1.0, enqueue_timeout=0.01,
+                               session_factory=lambda: FakeSession([]))
+
+    assert buffer.submit(*make_pair("MSFT", 1.0)) is False
+
+    mocker.patch.object(WriteBehindBuffer, "running", new_callable=mocker.PropertyMock, return_value=True)
+    assert buffer.submit(*make_pair("MSFT", 1.0)) is True
+    assert buffer.submit(*make_pair("MSFT", 2.0)) is False
+
+
+def test_write_behind_retries_then_stores_rows_one_by_one(mocker):
+    published = mocker.patch("app.service.write_behind.publish_price_event")
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+    buffer = WriteBehindBuffer(max_size=10, batch_size=10, flush_interval=1.0, enqueue_timeout=0.1,
+                               session_factory=lambda: Session(engine), retry_backoff=0)
+    good = [make_pair("AAPL", 100.0), make_pair("AAPL", 101.0)]
+    bad = make_pair("AAPL", 102.0)
+    bad[1].id = good[0][1].id
+
+    buffer._write_batch([good[0], bad, good[1]])
+
+    with Session(engine) as session:
+        stored = session.exec(select(PricePoint)).all()
+    assert sorted(point.price for point in stored) == [100.0, 101.0]
+    assert [call.args[0]["price"] for call in published.call_args_list] == [100.0, 101.0]
+
+
+def test_write_behind_rejects_submissions_once_stopping(mocker):
+    buffer = WriteBehindBuffer(max_size=10, batch_size=10, flush_interval=1.0, enqueue_timeout=0.01,
+                               session_factory=lambda: FakeSession([]))
+    mocker.patch.object(WriteBehindBuffer, "running", new_callable=mocker.PropertyMock, return_value=True)
+
+    buffer._stopping.set()
+
+    assert buffer.submit(*make_pair("MSFT", 1.0)) is False